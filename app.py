@@ -1,43 +1,56 @@
+import logging
 import streamlit as st
 from modules.session import init_session
-from modules.subpages.consent import show_consent
-from modules.subpages.demo import handle_demo_steps
-from modules.subpages.intro import show_intro
-from modules.subpages.trial_steps import handle_trial_steps
-from modules.subpages.final import show_final
-from modules.subpages.debrief import show_debrief
+from modules.database import flush_session_progress
+from modules.navigation import render_current_screen
 from modules.components.progress import show_progress
+from modules.components.telemetry import render_latency_probe
+from modules.subpages.admin import is_admin_request, show_admin
+from modules.interaction_log import begin_run, end_run
+
+logger = logging.getLogger(__name__)
 
 def main():
     try:
+        # 0) Admin pages do not belong to a participant session
+        if is_admin_request():
+            show_admin()
+            return
+
         # 1) Initialize or load session
         init_session()
+        begin_run()
 
-        # 2) Route the user to the correct "page"
-        page = st.session_state.page
-        if page == 'consent':
-            show_consent()
-        elif page == 'intro':
-            show_intro()
-        elif page == 'demo':
-            handle_demo_steps()
-        elif page == 'trial':
-            handle_trial_steps()
-        elif page == 'final':
-            show_final()
-        elif page == 'debrief':
-            show_debrief()
+        # 2) Render the user's screen, and the next one in the same run after a transition
+        page = render_current_screen()
 
         # 3) Show the progress bar on all pages except these
         if page not in ['consent', 'intro', 'demo']:
             show_progress()
 
+        # 4) Browser-side click-to-paint timing of this screen (if enabled)
+        render_latency_probe()
+
     except Exception as e:
         st.error(
             f"""⚠️ An unexpected error occurred:
             {str(e)} \n\n
             Please try to reload the page, switch browser, or press Enter after entering a value in Field A to ensure allocations to Fund B are updated automatically."""
         )
+
+    finally:
+        # 5) Persist debounced progress once it is due (also runs on st.stop())
+        if 'session_initialized' in st.session_state:
+            try:
+                flush_session_progress(st.query_params['session_id'])
+            except Exception:
+                # still pending, the next run tries again
+                logger.exception("Flushing the session progress failed")
+            try:
+                end_run(st.query_params['session_id'])
+            except Exception:
+                # the events stay buffered, the next run appends them
+                logger.exception("Appending the interaction events failed")
     
 if __name__ == "__main__":
     main()
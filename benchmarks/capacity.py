@@ -0,0 +1,335 @@
+"""
+Capacity planning for one app instance.
+
+`profile` measures the cost of every script run per screen (page/step), CPU time and
+database requests, by replaying recorded sessions (see benchmarks/replay.py) or
+synthetic ones through app.main against the local stand-in, and the memory a live
+session holds at the end of the study.
+
+`model` feeds these costs into a discrete-event simulation of one instance:
+participants arrive by a Poisson process (or in bursts), think between their runs as
+in the profiled sessions, and every run queues for the instance's CPU (script runs of
+one process share the GIL, so one core by default) and then waits for its database
+round trips. It reports the p95 step latency and the memory needed at an arrival rate,
+and the highest arrival rate whose p95 stays within the target. Run from the repository root:
+
+    python -m benchmarks.capacity profile --logs logs.jsonl --out profile.json
+    python -m benchmarks.capacity profile --sessions 3 --out profile.json     # synthetic sessions
+    python -m benchmarks.capacity model profile.json --trials mixed --rate 2 --slo-ms 1000
+"""
+import gc
+import json
+import time
+import heapq
+import random
+import argparse
+import resource
+import tracemalloc
+from itertools import count
+from collections import defaultdict, deque
+
+import numpy as np
+
+from benchmarks.replay import Replayer, _load_logs
+
+# Median think time per screen of synthetic sessions in seconds, drawn log-normally around it
+THINK_SECONDS = {
+    'consent/1': 60, 'intro/1': 90, 'demo/1': 20, 'demo/2': 20, 'demo/3': 15,
+    'trial/1': 12, 'trial/4': 15, 'trial/2': 10, 'trial/3': 6, 'final/3': 30
+}
+THINK_SIGMA = 0.5
+# Bisection steps of the maximum sustainable arrival rate
+SEARCH_ITERATIONS = 14
+
+# --- profile ---------------------------------------------------------------------
+
+def synthetic_log(max_trials, rng):
+    """A session log in the recorded format (see modules/interaction_log.py) that walks through the study"""
+    from modules.trial_plan import is_instructed_trial
+
+    def event(page, trial, step, widgets=None):
+        think = rng.lognormvariate(0, THINK_SIGMA) * THINK_SECONDS[f"{page}/{step}"]
+        return [int(think * 1000), page, trial, step, widgets or {}, 1]
+
+    events = [
+        [0, 'consent', 1, 1, {}, 0],
+        event('consent', 1, 1),
+        event('intro', 1, 1),
+        event('demo', 1, 1, {'demo_initial_a': 30}),
+        event('demo', 1, 2, {'adjusted_a': 40}),
+        event('demo', 1, 3)
+    ]
+    for trial in range(1, max_trials + 1):
+        events.append(event('trial', trial, 1, {f'initial_a_{trial}': rng.randint(0, 100)}))
+        if is_instructed_trial(max_trials, trial):
+            events.append(event('trial', trial, 4, {f'instructed_a_{trial}': 55}))
+        events.append(event('trial', trial, 2, {f'final_a_{trial}': rng.randint(0, 100)}))
+        events.append(event('trial', trial, 3))
+    events.append(event('final', max_trials, 3, {'demo_initial_a': rng.randint(0, 100)}))
+    return {'session_id': None, 'max_trials': max_trials, 'events': events}
+
+class ProfilingReplayer(Replayer):
+    """Replays sessions without think times, measuring CPU time and database requests per run"""
+
+    def __init__(self, timeout):
+        # an empty fault profile adds nothing, its injector counts the app's requests
+        super().__init__(speed=float('inf'), timeout=timeout, faults='{}')
+        from modules.database import supabase
+        self.injector = supabase.injector
+        self.app = None
+        self.session_id = None
+
+    def _start_session(self, max_trials):
+        self.session_id = super()._start_session(max_trials)
+        return self.session_id
+
+    def _requests(self):
+        return sum(self.injector.stats().values())
+
+    def _measure(self, at):
+        from modules.prefetch import wait_for_background
+        cpu, requests = time.process_time(), self._requests()
+        at.run()
+        # background work started by the run (deferred writes, prefetches) is part of its cost
+        wait_for_background(self.session_id)
+        self.app = at
+        return [time.process_time() - cpu, self._requests() - requests]
+
+    def retained_memory(self, log):
+        """Bytes held by a live session after replaying `log`, without the stand-in's table rows"""
+        gc.collect()
+        tracemalloc.start(25)
+        try:
+            self.replay(log)
+            gc.collect()
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, "*local_backend.py", all_frames=True),
+                tracemalloc.Filter(False, tracemalloc.__file__)
+            ])
+            return sum(stat.size for stat in snapshot.statistics('filename'))
+        finally:
+            self.app = None
+            tracemalloc.stop()
+
+def profile(logs, timeout):
+    """Per-screen run costs, think time scripts and memory per session of the replayed logs"""
+    replayer = ProfilingReplayer(timeout)
+    by_length = defaultdict(list)
+    for log in logs:
+        by_length[log['max_trials']].append(log)
+
+    runs, scripts, memory, diverged = defaultdict(list), {}, {}, 0
+    for max_trials, length_logs in sorted(by_length.items()):
+        # warm-up: imports, scenario caches and the outcome table are paid once per process
+        replayer.replay(length_logs[0])
+        for log in length_logs:
+            session_runs, session_diverged, _ = replayer.replay(log)
+            diverged += session_diverged
+            for screen, cost, failed in session_runs:
+                if not failed:
+                    runs[screen].append(cost)
+        scripts[str(max_trials)] = [
+            [[f"{page}/{step}", think_ms / 1000] for think_ms, page, trial, step, _, _ in log['events']]
+            for log in length_logs
+        ]
+    process_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    for max_trials, length_logs in by_length.items():
+        memory[str(max_trials)] = replayer.retained_memory(length_logs[0])
+
+    return {
+        'sessions': len(logs),
+        'diverged_sessions': diverged,
+        'runs': dict(runs),
+        'scripts': scripts,
+        'memory_per_session': memory,
+        'process_rss': process_rss
+    }
+
+# --- model -----------------------------------------------------------------------
+
+def _arrivals(rate_per_second, duration, pattern, burst_size, rng):
+    size = burst_size if pattern == 'burst' else 1
+    times, t = [], 0.0
+    while True:
+        t += rng.expovariate(rate_per_second / size)
+        if t > duration:
+            return times
+        times.extend([t] * size)
+
+def _lengths(trials):
+    return ['5', '100'] if trials == 'mixed' else [str(trials)]
+
+def simulate(profile, rate, trials='mixed', pattern='poisson', burst_size=10, cores=1,
+             db_latency=0.05, hours=2.0, seed=0):
+    """
+    One instance with participants arriving at `rate` per minute for `hours`, each
+    running a profiled script of the given study length (5, 100 or 'mixed').
+    """
+    rng = random.Random(seed)
+    all_runs = [cost for costs in profile['runs'].values() for cost in costs]
+    heap, order = [], count()
+    participants = []
+    for arrival in _arrivals(rate / 60, hours * 3600, pattern, burst_size, rng):
+        length = rng.choice(_lengths(trials))
+        participants.append({'length': length, 'script': rng.choice(profile['scripts'][length]), 'index': 0})
+        heapq.heappush(heap, (arrival, next(order), 'arrive', len(participants) - 1))
+
+    free, queue = cores, deque()
+    latencies, busy, sessions, peak_sessions, memory, peak_memory = [], 0.0, 0, 0, 0, 0
+    now = 0.0
+
+    def start(p, now):
+        nonlocal free
+        free -= 1
+        heapq.heappush(heap, (now + participants[p]['cpu'], next(order), 'cpu_done', p))
+
+    while heap:
+        now, _, kind, p = heapq.heappop(heap)
+        participant = participants[p]
+        if kind == 'arrive':
+            sessions += 1
+            memory += profile['memory_per_session'][participant['length']]
+            peak_sessions, peak_memory = max(peak_sessions, sessions), max(peak_memory, memory)
+            heapq.heappush(heap, (now + participant['script'][0][1], next(order), 'request', p))
+        elif kind == 'request':
+            screen = participant['script'][participant['index']][0]
+            participant['cpu'], participant['requests'] = rng.choice(profile['runs'].get(screen) or all_runs)
+            participant['requested'] = now
+            if free:
+                start(p, now)
+            else:
+                queue.append(p)
+        elif kind == 'cpu_done':
+            free += 1
+            busy += participant['cpu']
+            done = now + participant['requests'] * db_latency
+            latencies.append(done - participant['requested'])
+            participant['index'] += 1
+            if participant['index'] < len(participant['script']):
+                think = participant['script'][participant['index']][1]
+                heapq.heappush(heap, (done + think, next(order), 'request', p))
+            else:
+                heapq.heappush(heap, (done, next(order), 'leave', p))
+            if queue:
+                start(queue.popleft(), now)
+        else:
+            sessions -= 1
+            memory -= profile['memory_per_session'][participant['length']]
+
+    latencies = np.array(latencies or [0.0])
+    return {
+        'rate_per_minute': rate,
+        'participants': len(participants),
+        'runs': len(latencies),
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'cpu_utilization': busy / (cores * now) if now else 0.0,
+        'peak_sessions': peak_sessions,
+        'memory_bytes': profile['process_rss'] + peak_memory
+    }
+
+def cpu_per_participant(profile, trials):
+    """Mean CPU seconds of a participant's script runs"""
+    mean_cpu = {screen: np.mean([cpu for cpu, _ in costs]) for screen, costs in profile['runs'].items()}
+    fallback = np.mean(list(mean_cpu.values()))
+    totals = [
+        sum(mean_cpu.get(screen, fallback) for screen, _ in script)
+        for length in _lengths(trials) for script in profile['scripts'][length]
+    ]
+    return float(np.mean(totals))
+
+def max_sustainable_rate(profile, slo_ms, **options):
+    """
+    Highest arrival rate (per minute) whose p95 step latency stays within slo_ms, by
+    bisection below the rate that saturates the instance's CPU.
+    """
+    saturation = options.get('cores', 1) / cpu_per_participant(profile, options.get('trials', 'mixed')) * 60
+    low, high, best = 0.0, saturation, None
+    for _ in range(SEARCH_ITERATIONS):
+        rate = (low + high) / 2
+        result = simulate(profile, rate, **options)
+        if result['p95_ms'] <= slo_ms:
+            low, best = rate, result
+        else:
+            high = rate
+    return best
+
+def _mb(value):
+    return value / 2**20
+
+def _print_model(profile, options, at_rate, best, slo_ms):
+    requests = [r for costs in profile['runs'].values() for _, r in costs]
+    print(f"Profile: {profile['sessions']} sessions, {np.mean(requests):.1f} database requests per run")
+    for length in _lengths(options['trials']):
+        print(f"  {length:>3} trials: {cpu_per_participant(profile, int(length)):.2f}s CPU per participant, "
+              f"{_mb(profile['memory_per_session'][length]):.2f} MB per live session")
+    print(f"  process: {_mb(profile['process_rss']):.0f} MB")
+
+    def line(result):
+        return (f"p50 {result['p50_ms']:.0f} ms, p95 {result['p95_ms']:.0f} ms, "
+                f"CPU {result['cpu_utilization']:.0%}, peak {result['peak_sessions']} sessions, "
+                f"memory {_mb(result['memory_bytes']):.0f} MB")
+
+    if at_rate:
+        print(f"At {at_rate['rate_per_minute']:g} participants/min ({options['pattern']}, {options['trials']} trials): "
+              + line(at_rate))
+    if best:
+        print(f"Max. sustainable rate (p95 <= {slo_ms:g} ms): {best['rate_per_minute']:.2f} participants/min, "
+              + line(best))
+    else:
+        print(f"No arrival rate keeps p95 within {slo_ms:g} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    prof = commands.add_parser('profile', help="measure run costs by replaying sessions")
+    prof.add_argument('--logs', help="recorded logs (benchmarks.replay export), synthetic sessions otherwise")
+    prof.add_argument('--limit', type=int, help="replay only the first N recorded sessions")
+    prof.add_argument('--sessions', type=int, default=3, help="synthetic sessions per study length")
+    prof.add_argument('--timeout', type=float, default=60, help="seconds per script run")
+    prof.add_argument('--seed', type=int, default=0)
+    prof.add_argument('--out', default="capacity_profile.json")
+
+    model = commands.add_parser('model', help="simulate one instance with a profile")
+    model.add_argument('profile')
+    model.add_argument('--trials', choices=['5', '100', 'mixed'], default='mixed')
+    model.add_argument('--rate', type=float, help="participants per minute to report on")
+    model.add_argument('--pattern', choices=['poisson', 'burst'], default='poisson')
+    model.add_argument('--burst-size', type=int, default=10, help="participants arriving together with --pattern burst")
+    model.add_argument('--cores', type=int, default=1, help="script runs executing in parallel")
+    model.add_argument('--db-latency-ms', type=float, default=50, help="round trip time of a database request")
+    model.add_argument('--slo-ms', type=float, default=1000, help="p95 step latency target")
+    model.add_argument('--hours', type=float, default=2.0, help="duration of arrivals")
+    model.add_argument('--seed', type=int, default=0)
+    model.add_argument('--out', help="write results as JSON")
+    args = parser.parse_args()
+
+    if args.command == 'profile':
+        if args.logs:
+            logs = _load_logs(args.logs, args.limit)
+        else:
+            rng = random.Random(args.seed)
+            logs = [synthetic_log(max_trials, rng) for max_trials in (5, 100) for _ in range(args.sessions)]
+        result = profile(logs, args.timeout)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        print(f"Profiled {sum(len(costs) for costs in result['runs'].values())} runs of {result['sessions']} sessions "
+              f"({result['diverged_sessions']} diverged) to {args.out}")
+        return
+
+    with open(args.profile, "r", encoding="utf-8") as f:
+        prof_data = json.load(f)
+    options = {
+        'trials': args.trials, 'pattern': args.pattern, 'burst_size': args.burst_size, 'cores': args.cores,
+        'db_latency': args.db_latency_ms / 1000, 'hours': args.hours, 'seed': args.seed
+    }
+    at_rate = simulate(prof_data, args.rate, **options) if args.rate else None
+    best = max_sustainable_rate(prof_data, args.slo_ms, **options)
+    _print_model(prof_data, options, at_rate, best, args.slo_ms)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({'options': options, 'slo_ms': args.slo_ms, 'at_rate': at_rate, 'max_sustainable': best}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Replay recorded participant sessions through app.main.
+
+Sessions recorded with RECORD_INTERACTIONS=1 are re-driven through the app at 1x or
+accelerated speed and with configurable concurrency, against the in-memory Supabase
+stand-in (SUPABASE_URL=local). With --faults, the stand-in is slowed down or fails
+requests as described by a fault injection profile (see modules/fault_injection.py),
+and every replayed session is checked for responses missing in the database.
+Run from the repository root:
+
+    python -m benchmarks.replay export --out logs.jsonl           # study database from .env
+    python -m benchmarks.replay run logs.jsonl --speed 10 --concurrency 20 --out after.json
+    python -m benchmarks.replay run logs.jsonl --speed 10 --concurrency 20 --compare before.json
+    python -m benchmarks.replay run logs.jsonl --speed 10 --faults degraded.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import multiprocessing as mp
+from collections import defaultdict
+from datetime import datetime, timezone
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+def export_logs(out_path):
+    from dotenv import load_dotenv
+    from supabase import create_client
+    load_dotenv()
+    client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+    rows = client.table('interaction_logs').select('*').execute().data
+    with open(out_path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+    print(f"Exported {len(rows)} session logs to {out_path}")
+
+def _load_logs(path, limit=None):
+    with open(path, "r", encoding="utf-8") as f:
+        logs = [json.loads(line) for line in f if line.strip()]
+    return logs[:limit] if limit else logs
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+class Replayer:
+    """Replays sessions one after another in the current process"""
+
+    def __init__(self, speed, timeout, faults=None):
+        # the app modules pick up the local stand-in (and the fault profile) on import
+        os.environ["SUPABASE_URL"] = "local"
+        os.environ.pop("RECORD_INTERACTIONS", None)
+        if faults:
+            os.environ["FAULT_INJECTION"] = faults
+        from modules.database import supabase
+        # the driver itself reads and writes without faults
+        self.client = getattr(supabase, 'wrapped', supabase)
+        self.speed = speed
+        self.timeout = timeout
+
+    def _start_session(self, max_trials):
+        """Create the session row like _create_new_session, with a scenario of the recorded length"""
+        scenario = next(s for s in self.client.tables['scenario_config'] if s['num_trials'] == max_trials)
+        sequence = self.client.tables['trial_sequences'][0]
+        session_id = str(uuid.uuid4())
+        self.client.table('sessions').insert({
+            'session_id': session_id,
+            'scenario_id': scenario['scenario_id'],
+            'trial_sequence_id': sequence['trial_sequence_id'],
+            'current_page': 'consent',
+            'current_trial': 1,
+            'current_trial_step': 1,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'max_trials': max_trials
+        }).execute()
+        return session_id
+
+    def _stored_responses(self, session_id):
+        """(actual trial, allocation type) -> (fund_a, fund_b) as stored in the database"""
+        from modules.database import uses_packed_storage
+        from modules.packed_responses import as_trial_rows
+
+        if uses_packed_storage():
+            records = self.client.table('session_responses').select('*').eq('session_id', session_id).execute().data
+            trials = as_trial_rows(records[0] if records else None)
+        else:
+            trials = self.client.table('trials').select('*, allocations(*)').eq('session_id', session_id).execute().data
+        return {
+            (trial['trial_number'], alloc['allocation_type']): (alloc['fund_a'], alloc['fund_b'])
+            for trial in trials for alloc in trial['allocations']
+        }
+
+    def _missing_responses(self, session_id, state):
+        """Number of responses the participant gave that are not (or differently) stored"""
+        from modules.prefetch import wait_for_background
+
+        if 'allocations' not in state or 'trial_plan' not in state:
+            return 0
+        wait_for_background(session_id)
+        stored = self._stored_responses(session_id)
+        missing = 0
+        for ordinal, allocations in state.allocations.items():
+            actual_trial = state.trial_plan[ordinal - 1]['actual_trial']
+            for allocation_type, values in allocations.items():
+                if values is not None and stored.get((actual_trial, allocation_type)) != tuple(values):
+                    missing += 1
+        return missing
+
+    def replay(self, log):
+        """Returns ([(screen, _measure() of the run, failed)], diverged, missing responses)"""
+        from streamlit.testing.v1 import AppTest
+
+        at = AppTest.from_file(APP_PATH, default_timeout=self.timeout)
+        session_id = self._start_session(log['max_trials'])
+        at.query_params['session_id'] = session_id
+
+        runs = []
+        for think_ms, page, trial, step, widgets, transitioned in log['events']:
+            time.sleep(think_ms / 1000 / self.speed)
+
+            state = at.session_state
+            if 'page' in state and (state.page, state.trial, state.trial_step) != (page, trial, step):
+                return runs, True, self._missing_responses(session_id, at.session_state)
+
+            for key, value in widgets.items():
+                try:
+                    at.number_input(key=key).set_value(value)
+                except KeyError:
+                    pass
+            if transitioned:
+                # confirmation checkboxes are not recorded, every screen has one primary button
+                for checkbox in at.checkbox:
+                    checkbox.check()
+                if at.button:
+                    at.button[0].click()
+
+            runs.append((f"{page}/{step}", self._measure(at), bool(at.exception or at.error)))
+        return runs, False, self._missing_responses(session_id, at.session_state)
+
+    def _measure(self, at):
+        """Run the script once, returns its latency in seconds"""
+        started = time.perf_counter()
+        at.run()
+        return time.perf_counter() - started
+
+_replayer = None
+
+def _init_worker(speed, timeout, faults):
+    global _replayer
+    _replayer = Replayer(speed, timeout, faults)
+
+def _replay(log):
+    return _replayer.replay(log)
+
+def run_replay(logs, speed, concurrency, timeout, faults=None):
+    """
+    Replay logs with `concurrency` sessions in flight. Streamlit's test runner is not
+    thread-safe, so every concurrent session gets its own worker process (each with its
+    own in-memory stand-in); the processes compete for the machine like app workers do.
+    """
+    latencies = defaultdict(list)
+    errors = diverged = missing = 0
+
+    started = time.perf_counter()
+    with mp.Pool(concurrency, initializer=_init_worker, initargs=(speed, timeout, faults)) as pool:
+        for runs, session_diverged, session_missing in pool.imap_unordered(_replay, logs):
+            diverged += session_diverged
+            missing += session_missing
+            for screen, seconds, failed in runs:
+                latencies[screen].append(seconds)
+                errors += failed
+    wall = time.perf_counter() - started
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    return {
+        'sessions': len(logs),
+        'concurrency': concurrency,
+        'speed': speed,
+        'wall_seconds': wall,
+        'runs_per_second': len(all_latencies) / wall if wall else 0.0,
+        'errors': errors,
+        'diverged_sessions': diverged,
+        'missing_responses': missing,
+        'faults': faults,
+        'overall': {'p50': _percentile(all_latencies, 0.5), 'p95': _percentile(all_latencies, 0.95)},
+        'screens': {
+            screen: {
+                'runs': len(values),
+                'p50': _percentile(values, 0.5),
+                'p95': _percentile(values, 0.95),
+                'max': max(values)
+            }
+            for screen, values in sorted(latencies.items())
+        }
+    }
+
+def _print_results(results, before=None):
+    print(f"{results['sessions']} sessions, concurrency {results['concurrency']}, speed {results['speed']}x: "
+          f"{results['runs_per_second']:.1f} runs/s, {results['errors']} errors, "
+          f"{results['diverged_sessions']} diverged, {results['missing_responses']} responses not stored"
+          + (f" (faults: {results['faults']})" if results['faults'] else ""))
+    print(f"{'screen':<14} {'runs':>6} {'p50 ms':>9} {'p95 ms':>9}" + (f" {'p95 before':>11}" if before else ""))
+    for screen, stats in results['screens'].items():
+        line = f"{screen:<14} {stats['runs']:>6} {stats['p50'] * 1000:>9.1f} {stats['p95'] * 1000:>9.1f}"
+        if before and screen in before['screens']:
+            line += f" {before['screens'][screen]['p95'] * 1000:>11.1f}"
+        print(line)
+    overall = results['overall']
+    line = f"{'overall':<14} {'':>6} {overall['p50'] * 1000:>9.1f} {overall['p95'] * 1000:>9.1f}"
+    if before:
+        line += f" {before['overall']['p95'] * 1000:>11.1f}"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="download recorded logs from the study database")
+    export.add_argument('--out', default="interaction_logs.jsonl")
+
+    run = commands.add_parser('run', help="replay recorded logs against the local stand-in")
+    run.add_argument('logs')
+    run.add_argument('--speed', type=float, default=1.0, help="1 = recorded think times, 10 = ten times faster")
+    run.add_argument('--concurrency', type=int, default=10)
+    run.add_argument('--limit', type=int, help="replay only the first N sessions")
+    run.add_argument('--timeout', type=float, default=60, help="seconds per script run")
+    run.add_argument('--out', help="write results as JSON")
+    run.add_argument('--compare', help="results JSON of an earlier run")
+    run.add_argument('--faults', help="fault injection profile, JSON file or inline JSON")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_logs(args.out)
+        return
+
+    results = run_replay(_load_logs(args.logs, args.limit), args.speed, args.concurrency, args.timeout, args.faults)
+    before = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            before = json.load(f)
+    _print_results(results, before)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if results['errors'] or results['missing_responses']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    # the app's script runner replaces __main__ in the workers, pickle the pool
+    # functions by their importable name instead
+    from benchmarks.replay import main
+    main()
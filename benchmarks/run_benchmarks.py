@@ -0,0 +1,147 @@
+"""
+Benchmarks for session assignment, resume parsing and performance chart building.
+
+Reports time per call and peak memory per operation, each the best of several
+rounds after a warm-up: session assignment at each dataset size, the operations
+on one participant once. Run from the repository root:
+
+    python -m benchmarks.run_benchmarks                    # run and compare with baseline
+    python -m benchmarks.run_benchmarks --save-baseline    # store results as new baseline
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import random
+import argparse
+import tracemalloc
+
+# The app modules create a Supabase client on import, no request is sent by the benchmarks
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+
+from benchmarks import synthetic
+from modules.session import get_session_config, _parse_session_state
+from modules.trial_plan import build_trial_plan, performance_values
+from modules.components.charts import create_performance_bar_chart
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+# Target length of one timing round, and of all rounds of an operation
+ROUND_SECONDS = 0.02
+ROUND_BUDGET_SECONDS = 1.0
+MIN_ROUNDS = 5
+
+def _measure(fn):
+    """Seconds per call and peak traced memory of one call, each the best of several rounds"""
+    fn()  # warm-up
+    start = time.perf_counter()
+    fn()
+    once = time.perf_counter() - start
+    # short rounds (sub-millisecond operations are called many times per round), as many
+    # as fit in ROUND_BUDGET_SECONDS: the fastest round is the one least slowed down by noise
+    number = max(1, int(ROUND_SECONDS / once))
+    rounds = max(MIN_ROUNDS, int(ROUND_BUDGET_SECONDS / (number * once)))
+    seconds = min(timeit.Timer(fn).repeat(repeat=rounds, number=number)) / number
+
+    peaks = []
+    for _ in range(MIN_ROUNDS):
+        tracemalloc.start()
+        fn()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return seconds, min(peaks)
+
+def _sized_benchmarks(data):
+    """Operations whose cost grows with the number of sessions"""
+    seqs, scens, sessions = data['trial_sequences'], data['scenarios'], data['sessions']
+    return {
+        'get_session_config': lambda: get_session_config(seqs, scens, sessions, lock_window_hours=1.5),
+    }
+
+def _fixed_benchmarks(rnd):
+    """Operations on one participant, independent of the study size"""
+    data = synthetic.dataset(100, seed=0)
+    seq_rec = rnd.choice(data['trial_sequences'])
+    tables = {n: synthetic.scenario_tables(n, rnd) for n in (5, 100)}
+
+    # a resumed 100-trial participant near the end of the study
+    long_sessions = [s for s in data['sessions'] if s['max_trials'] == 100]
+    session = dict(rnd.choice(long_sessions), trial_sequence_id=seq_rec['trial_sequence_id'],
+                   current_page='trial', current_trial=90)
+    joined = synthetic.joined_session(session, seq_rec, rnd)
+    fund_returns, ai_recommendations = tables[session['max_trials']]
+
+    trial_seq = seq_rec['three_month_trials']
+    plan = build_trial_plan(trial_seq, *tables[100])
+    entry = plan[41]
+
+    def show_performance():
+        performance = performance_values(entry, 60, 40)
+        return create_performance_bar_chart(performance, entry['y_range'], margin=dict(t=20, b=20))
+
+    return {
+        'parse_session_state': lambda: _parse_session_state(
+            joined, joined['trials'], seq_rec, fund_returns, ai_recommendations),
+        'build_trial_plan': lambda: build_trial_plan(trial_seq, *tables[100]),
+        'create_performance_bar_chart': lambda: create_performance_bar_chart(
+            (12.0, 8.5, 20.1, -3.2), [-35, 35], margin=dict(t=20, b=20)),
+        'show_performance': show_performance,
+    }
+
+def _record(results, name, fn):
+    seconds, peak = _measure(fn)
+    results[name] = {'seconds': seconds, 'peak_bytes': peak}
+    print(f"{name:<40} {seconds * 1000:>10.3f} ms {peak / 1024:>10.1f} KiB", flush=True)
+
+def run(sizes, seed=0):
+    results = {}
+    for name, fn in _fixed_benchmarks(random.Random(seed)).items():
+        _record(results, name, fn)
+    for size in sizes:
+        data = synthetic.dataset(size, seed=seed)
+        for name, fn in _sized_benchmarks(data).items():
+            _record(results, f"{name}[{size}]", fn)
+    return results
+
+def compare(results, baseline, tolerance):
+    """Print the ratio to the baseline, return the names that got slower than tolerance"""
+    regressions = []
+    print(f"\n{'operation':<40} {'time':>8} {'memory':>8}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        time_ratio = result['seconds'] / base['seconds']
+        mem_ratio = result['peak_bytes'] / base['peak_bytes'] if base['peak_bytes'] else 1.0
+        flag = ""
+        if time_ratio > tolerance or mem_ratio > tolerance:
+            flag = "  <-- regression"
+            regressions.append(name)
+        print(f"{name:<40} {time_ratio:>7.2f}x {mem_ratio:>7.2f}x{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help="ratio to the baseline above which an operation counts as regression")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.seed)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {BASELINE_PATH}")
+    elif os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
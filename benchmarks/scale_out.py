@@ -0,0 +1,125 @@
+"""
+Throughput of stateless workers sharing participant state.
+
+Every simulated rerun picks a random session (so consecutive reruns of one
+participant land on different processes) and resumes it the way the app does:
+the session record with its responses (load_session_record), the trial sequence,
+the shared snapshot and _parse_session_state. It then renders the performance
+step and writes the advanced state to the shared SQLite store. Each worker holds
+the same sessions in its in-memory Supabase stand-in. Run from the repository root:
+
+    python -m benchmarks.scale_out --workers 1 2 4 8 --reruns 4000
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing as mp
+from datetime import datetime, timezone
+
+from benchmarks import synthetic
+
+def _seed_sessions(client, num_sessions, max_trials):
+    """Sessions part-way through the study, identical in every worker"""
+    rnd = random.Random(0)
+    scenario = next(s for s in client.tables['scenario_config'] if s['num_trials'] == max_trials)
+    session_ids = []
+    for i in range(num_sessions):
+        session = {
+            'session_id': f"session-{i}", 'scenario_id': scenario['scenario_id'],
+            'trial_sequence_id': rnd.choice(client.tables['trial_sequences'])['trial_sequence_id'],
+            'current_page': 'trial', 'current_trial': rnd.randint(1, max_trials), 'current_trial_step': 3,
+            'max_trials': max_trials, 'created_at': datetime.now(timezone.utc).isoformat()
+        }
+        seq_rec = next(s for s in client.tables['trial_sequences']
+                       if s['trial_sequence_id'] == session['trial_sequence_id'])
+        joined = synthetic.joined_session(session, seq_rec, rnd)
+        client.table('sessions').insert(session).execute()
+        for trial in joined['trials']:
+            allocations = trial.pop('allocations')
+            client.table('trials').insert(trial).execute()
+            client.table('allocations').insert(allocations).execute()
+        session_ids.append(session['session_id'])
+    return session_ids
+
+# sessions seeded in this worker process by _init_worker
+_session_ids = []
+
+def _init_worker(num_sessions, max_trials, ready):
+    # imported here, after spawning, so every worker opens its own store connection
+    from modules.database import supabase
+    _session_ids.extend(_seed_sessions(supabase, num_sessions, max_trials))
+    # the measurement starts once every worker has imported and seeded
+    ready.wait()
+
+def _worker(args):
+    num_reruns, max_trials, seed = args
+    from modules.database import load_session_record, load_trial_sequence
+    from modules.session import _parse_session_state, _fetch_fund_returns, _fetch_ai_recommendations
+    from modules.state_store import load_snapshot, save_snapshot, snapshot_state
+    from modules.trial_plan import performance_values
+    from modules.components.charts import create_performance_bar_chart
+
+    rnd = random.Random(seed)
+    for _ in range(num_reruns):
+        session_id = rnd.choice(_session_ids)
+        session_data = load_session_record(session_id)
+        state = _parse_session_state(
+            session_data,
+            session_data['trials'],
+            load_trial_sequence(session_data['trial_sequence_id']),
+            _fetch_fund_returns(session_data['scenario_id']),
+            _fetch_ai_recommendations(session_data['scenario_id']),
+            load_snapshot(session_id)
+        )
+
+        ordinal = state['trial']
+        entry = state['trial_plan'][ordinal - 1]
+        final_a, final_b = state['allocations'][ordinal]['final']
+        fig = create_performance_bar_chart(performance_values(entry, final_a, final_b), entry['y_range'])
+        fig.to_json()
+
+        next_ordinal = ordinal % max_trials + 1
+        state['trial'] = next_ordinal
+        state['allocations'][next_ordinal] = {'initial': (50, 50), 'ai': (entry['ai_a'], entry['ai_b']), 'final': (60, 40)}
+        save_snapshot(session_id, snapshot_state(state))
+    return num_reruns
+
+def run(workers, num_reruns, num_sessions, max_trials):
+    # spawned workers share nothing with the parent, in particular no SQLite connection
+    ctx = mp.get_context('spawn')
+    results = []
+    for n in workers:
+        per_worker = num_reruns // n
+        with ctx.Pool(n, _init_worker, (num_sessions, max_trials, ctx.Barrier(n))) as pool:
+            # imports and seeding are not part of the measured reruns
+            pool.map(_worker, [(0, max_trials, 0)])
+            start = time.perf_counter()
+            done = sum(pool.map(_worker, [(per_worker, max_trials, seed) for seed in range(n)]))
+            elapsed = time.perf_counter() - start
+        results.append((n, done / elapsed))
+
+    base = results[0][1]
+    print(f"{'workers':>8} {'reruns/s':>10} {'speedup':>8}")
+    for n, throughput in results:
+        print(f"{n:>8} {throughput:>10.1f} {throughput / base:>7.2f}x")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--reruns', type=int, default=4000)
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--max-trials', type=int, default=100, choices=[5, 100])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # inherited by the workers, which read them when importing the app modules
+        os.environ['SUPABASE_URL'] = 'local'
+        os.environ['RESPONSE_STORAGE'] = 'normalized'
+        os.environ['STATE_STORE_PATH'] = os.path.join(tmp, 'state.db')
+        run(args.workers, args.reruns, args.sessions, args.max_trials)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Synthetic study data in the shape returned by the Supabase tables."""
+import uuid
+import random
+from datetime import datetime, timedelta, timezone
+
+ALLOCATION_TYPES = ('initial', 'ai', 'final')
+
+def scenarios():
+    return [
+        {'scenario_id': str(uuid.UUID(int=i + 1)), 'scenario_name': name, 'ai_type': ai_type,
+         'num_trials': num_trials, 'periods_per_trial': 1, 'description': ''}
+        for i, (name, ai_type, num_trials) in enumerate([
+            ('short-balanced', 'balanced', 5), ('short-unbalanced', 'unbalanced', 5),
+            ('long-balanced', 'balanced', 100), ('long-unbalanced', 'unbalanced', 100)
+        ])
+    ]
+
+def trial_sequences(num_sequences, rnd):
+    seqs = []
+    for _ in range(num_sequences):
+        five_year = list(range(1, 6))
+        three_month = list(range(1, 101))
+        rnd.shuffle(five_year)
+        rnd.shuffle(three_month)
+        seqs.append({
+            'trial_sequence_id': str(uuid.UUID(int=rnd.getrandbits(128))),
+            'five_year_trials': five_year,
+            'three_month_trials': three_month
+        })
+    return seqs
+
+def scenario_tables(max_trials, rnd):
+    """(fund_returns, ai_recommendations) dicts as returned by the cached fetches"""
+    fund_returns = {t: (rnd.uniform(-0.3, 0.5), rnd.uniform(-0.05, 0.1)) for t in range(1, max_trials + 1)}
+    ai_recommendations = {}
+    for t in range(1, max_trials + 1):
+        ai_a = rnd.randint(0, 100)
+        ai_recommendations[t] = (ai_a, 100 - ai_a)
+    return fund_returns, ai_recommendations
+
+def sessions(num_sessions, seqs, scens, rnd, now=None):
+    """Session rows spread over the last two weeks, about 70 % completed"""
+    now = now or datetime.now(timezone.utc)
+    rows = []
+    for _ in range(num_sessions):
+        scenario = rnd.choice(scens)
+        created = now - timedelta(minutes=rnd.uniform(0, 14 * 24 * 60))
+        completed = rnd.random() < 0.7
+        rows.append({
+            'session_id': str(uuid.UUID(int=rnd.getrandbits(128))),
+            'scenario_id': scenario['scenario_id'],
+            'trial_sequence_id': rnd.choice(seqs)['trial_sequence_id'],
+            'current_page': 'debrief' if completed else rnd.choice(['consent', 'intro', 'demo', 'trial', 'final']),
+            'current_trial': scenario['num_trials'] if completed else rnd.randint(1, scenario['num_trials']),
+            'current_trial_step': rnd.randint(1, 3),
+            'max_trials': scenario['num_trials'],
+            'consent_given': True,
+            'instructed_response_2_passed': rnd.random() < 0.9,
+            'data_quality': completed and rnd.random() < 0.95,
+            'data_quality_comment': None,
+            'state_snapshot': None,
+            'created_at': created.isoformat(),
+            'completed_at': (created + timedelta(minutes=rnd.uniform(10, 60))).isoformat() if completed else None
+        })
+    return rows
+
+def joined_session(session, seq_rec, rnd):
+    """Session row with embedded trials(*, allocations(*)) up to its current trial"""
+    trial_seq = seq_rec['five_year_trials'] if session['max_trials'] == 5 else seq_rec['three_month_trials']
+    trials = []
+    for actual_trial in trial_seq[:session['current_trial']]:
+        trial_id = str(uuid.UUID(int=rnd.getrandbits(128)))
+        allocations = []
+        for alloc_type in ALLOCATION_TYPES:
+            fund_a = rnd.randint(0, 100)
+            allocations.append({
+                'allocation_id': str(uuid.UUID(int=rnd.getrandbits(128))),
+                'trial_id': trial_id,
+                'allocation_type': alloc_type,
+                'fund_a': fund_a,
+                'fund_b': 100 - fund_a,
+                'portfolio_return': None,
+                'created_at': session['created_at']
+            })
+        trials.append({
+            'trial_id': trial_id,
+            'session_id': session['session_id'],
+            'trial_number': actual_trial,
+            'return_a': None,
+            'return_b': None,
+            'created_at': session['created_at'],
+            'allocations': allocations
+        })
+    return {**session, 'trials': trials}
+
+def dataset(num_sessions, num_sequences=50, seed=0):
+    """Generate sequences, scenarios and sessions for a study of num_sessions participants"""
+    rnd = random.Random(seed)
+    scens = scenarios()
+    seqs = trial_sequences(num_sequences, rnd)
+    return {
+        'scenarios': scens,
+        'trial_sequences': seqs,
+        'sessions': sessions(num_sessions, seqs, scens, rnd)
+    }
@@ -0,0 +1,84 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+
+# Max. number of session creations (table scans + insert) running at the same time per process
+MAX_CONCURRENT_CREATIONS = int(os.environ.get("MAX_CONCURRENT_SESSION_CREATIONS", 4))
+# How often the waiting room checks for a free slot
+POLL_INTERVAL_SECONDS = 2
+# Waiting participants that stopped polling (closed tab) give up their place
+TICKET_EXPIRY_SECONDS = 5 * POLL_INTERVAL_SECONDS
+
+class AdmissionController:
+    """
+    FIFO admission control for new session creations.
+
+    Sessions that already exist are never queued, so participants that are past
+    consent keep priority over new arrivals.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._active = 0
+        # session_id -> (enqueued_at, last_seen)
+        self._queue = OrderedDict()
+        self._waits = deque(maxlen=1000)
+        self._admitted = 0
+        self._expired = 0
+
+    def _prune(self, now):
+        for session_id, (_, last_seen) in list(self._queue.items()):
+            if now - last_seen > TICKET_EXPIRY_SECONDS:
+                del self._queue[session_id]
+                self._expired += 1
+
+    def try_admit(self, session_id):
+        """Take a creation slot if one is free and the session is next in line."""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            enqueued_at, _ = self._queue.get(session_id, (now, now))
+            self._queue[session_id] = (enqueued_at, now)
+
+            if self._active >= self.limit or next(iter(self._queue)) != session_id:
+                return False
+
+            del self._queue[session_id]
+            self._active += 1
+            self._admitted += 1
+            self._waits.append(now - enqueued_at)
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+
+    def poll(self, session_id):
+        """Cheap check used by the waiting room: position in queue (0 = next) and whether a slot is free."""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            if session_id not in self._queue:
+                return 0, self._active < self.limit
+            enqueued_at, _ = self._queue[session_id]
+            self._queue[session_id] = (enqueued_at, now)
+            position = list(self._queue).index(session_id)
+            return position, position == 0 and self._active < self.limit
+
+    def metrics(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                'active_creations': self._active,
+                'queue_length': len(self._queue),
+                'admitted_total': self._admitted,
+                'expired_total': self._expired,
+                'wait_mean_s': sum(waits) / len(waits) if waits else 0.0,
+                'wait_p95_s': waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                'wait_max_s': waits[-1] if waits else 0.0,
+            }
+
+# One controller per Streamlit process
+admission = AdmissionController(MAX_CONCURRENT_CREATIONS)
@@ -0,0 +1,36 @@
+"""
+Static study assets.
+
+Images are served by Streamlit's static file serving (static/ at app/static/, see
+server.enableStaticServing in .streamlit/config.toml) instead of its media pipeline.
+Their URLs carry a hash of the file content (?v=...), which the static handler answers
+as cacheable for ten years, so a browser downloads each image once per study and
+reruns only send the <img> reference. Texts are read once per process.
+"""
+import os
+import streamlit as st
+from streamlit import config
+from tornado.web import StaticFileHandler
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS_DIR = os.path.join(ROOT_DIR, "assets")
+# Served by Streamlit at app/static/, next to the main script
+STATIC_DIR = os.path.join(ROOT_DIR, "static")
+
+def asset_url(path):
+    """Content-hashed URL of a file in static/, relative to the app's base URL"""
+    version = StaticFileHandler.get_version({'static_path': STATIC_DIR}, path)
+    return f"app/static/{path}?v={version}"
+
+def show_image(name, width):
+    """An image of static/images, by URL (st.image when static serving is off)"""
+    if not config.get_option("server.enableStaticServing"):
+        st.image(os.path.join(STATIC_DIR, "images", name), width=width)
+        return
+    st.markdown(f'<img src="{asset_url(f"images/{name}")}" width="{width}" alt="">', unsafe_allow_html=True)
+
+@st.cache_resource(show_spinner=False)
+def load_text(name):
+    """A text of assets/text"""
+    with open(os.path.join(ASSETS_DIR, "text", name), "r", encoding="utf-8") as f:
+        return f.read()
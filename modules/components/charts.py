@@ -1,25 +1,26 @@
 import plotly.graph_objects as go
-import streamlit as st
 
-def create_performance_bar_chart(df, margin=None, fixed_y_range=None):
+PERFORMANCE_CATEGORIES = ['Your Portfolio 👤', 'AI Portfolio ✨', 'Fund A 🔵', 'Fund B 🟡']
+
+def create_performance_bar_chart(performance, fixed_y_range, margin=None):
     """
     Create a bar chart for performance data.
     
     Parameters:
-      - df: DataFrame with columns 'Category' and 'Performance' (in %)
-      - margin: Optional dictionary to control figure margins
+      - performance: Sequence of performances (in %) in the order of PERFORMANCE_CATEGORIES
       - fixed_y_range: A tuple or list defining the fixed y-axis range (e.g., [-10, 10])
+      - margin: Optional dictionary to control figure margins
       
-    This function fixes the y-axis scaling to ensure that a given return 
+    The fixed y-axis range ensures that a given return 
     always appears the same across different charts.
     """
     # Create the bar chart
     fig = go.Figure(data=[
         go.Bar(
-            x=df['Category'],
-            y=df['Performance'],
-            marker_color=['green' if p >= 0 else 'red' for p in df['Performance']],
-            text=[f"{val:.2f}%" for val in df['Performance']],
+            x=PERFORMANCE_CATEGORIES,
+            y=list(performance),
+            marker_color=['green' if p >= 0 else 'red' for p in performance],
+            text=[f"{val:.2f}%" for val in performance],
             textposition='outside',
             textfont=dict(
                 color='black',
@@ -27,13 +28,6 @@ def create_performance_bar_chart(df, margin=None, fixed_y_range=None):
             )    
         ),
     ])
-    
-    #set the fixed range based on returns analysis for scenarios
-    # scale so that average return for each fund appears the same size on the subjects screen across conditions
-    if st.session_state.max_trials == 100:
-        fixed_y_range = [-35, 35]
-    else:
-        fixed_y_range = [-135, 135]
 
     fig.update_layout(
     xaxis=dict(
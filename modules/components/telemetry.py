@@ -0,0 +1,40 @@
+import os
+import streamlit as st
+import streamlit.components.v1 as components
+
+# Timings are sent in batches of this size (and when the tab is hidden or closed)
+BATCH_SIZE = 10
+# Clicks older than this are not matched to a paint (e.g. the tab was in the background)
+MAX_LATENCY_MS = 60000
+
+# Frontend of the probe: a static page, no build step
+_latency_probe = components.declare_component(
+    "latency_probe", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "latency_probe")
+)
+
+def telemetry_enabled():
+    # Needs a key that is safe to expose to the browser (anon key, insert-only policy)
+    return bool(os.environ.get("TELEMETRY_KEY"))
+
+def render_latency_probe():
+    """Measure click-to-paint latency of the current screen in the participant's browser"""
+    if not telemetry_enabled():
+        return
+
+    config = {
+        'endpoint': os.environ.get("SUPABASE_URL", "").rstrip('/') + "/rest/v1/client_timings",
+        'key': os.environ["TELEMETRY_KEY"],
+        'batchSize': BATCH_SIZE,
+        'maxLatency': MAX_LATENCY_MS,
+        'context': {
+            'session_id': st.query_params.get('session_id'),
+            'page': st.session_state.get('page'),
+            'trial': st.session_state.get('trial'),
+            'trial_step': st.session_state.get('trial_step'),
+        }
+    }
+    # The key keeps the iframe mounted across the runs of a screen; the config and the run number
+    # reach the probe as a render message, which changes with the run number on every run
+    run = st.session_state.get('latency_probe_run', 0)
+    st.session_state.latency_probe_run = run + 1
+    _latency_probe(config=config, run=run, key="latency_probe", default=None)
@@ -1,93 +1,369 @@
 import os
-import uuid
+import time
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 from supabase import create_client, Client
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from modules.state_store import uses_local_store, snapshot_state, save_snapshot
+from modules.packed_responses import slot, as_trial_rows
+from modules.operation_keys import trial_key, allocation_key, demographics_key
+from modules.prefetch import schedule, wait_for_background
+from modules.record_cache import record_cache
+from modules.fault_injection import with_faults
 
 # Load environment variables here so it's done once
 load_dotenv()
 
-# Create a global Supabase client
+# Create a global Supabase client (SUPABASE_URL=local: in-memory stand-in for local runs)
 url = os.environ.get("SUPABASE_URL")
 key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
+if url == "local":
+    from modules.local_backend import LocalSupabase
+    supabase = LocalSupabase.seeded()
+else:
+    supabase: Client = create_client(url, key)
+# FAULT_INJECTION: added latency, errors and stalls for testing degraded backends
+supabase = with_faults(supabase)
 
-def update_session_progress(session_id: str):
-    """Update session progress in database."""
-    supabase.table('sessions').update({
-        'current_page': st.session_state.page,
-        'current_trial': st.session_state.trial,
-        'current_trial_step': st.session_state.trial_step
-    }).eq('session_id', session_id).execute()
+# 'normalized' (trials + allocations rows) or 'packed' (one session_responses row per session)
+RESPONSE_STORAGE = os.environ.get("RESPONSE_STORAGE", "normalized")
+
+def uses_packed_storage():
+    return RESPONSE_STORAGE == 'packed'
+
+# Max. rows PostgREST returns per request (its default max-rows)
+MAX_ROWS_PER_REQUEST = 1000
+
+def fetch_all(query_fn):
+    """All rows of the query built by query_fn(), fetched in MAX_ROWS_PER_REQUEST ranges"""
+    rows, start = [], 0
+    while True:
+        page = query_fn().range(start, start + MAX_ROWS_PER_REQUEST - 1).execute().data
+        rows.extend(page)
+        if len(page) < MAX_ROWS_PER_REQUEST:
+            return rows
+        start += MAX_ROWS_PER_REQUEST
+
+# Step-only changes within the same trial are deferred for up to this long and coalesced
+# with the next write. On resume the step is re-derived from the stored allocations; page
+# changes and demo steps, which can't be re-derived, are always written immediately.
+PROGRESS_DEBOUNCE_SECONDS = 30
+
+def _current_progress():
+    return (st.session_state.page, st.session_state.trial, st.session_state.trial_step)
+
+def mark_progress_persisted(progress):
+    """Record the (page, trial, step) that is currently stored for the session."""
+    st.session_state.persisted_progress = tuple(progress)
+    st.session_state.progress_pending_since = None
+
+def _progress_update(progress, fields: dict):
+    update = {
+        'current_page': progress[0],
+        'current_trial': progress[1],
+        'current_trial_step': progress[2],
+        **fields
+    }
+    if not uses_local_store():
+        update['state_snapshot'] = snapshot_state(st.session_state)
+    return update
+
+def _caches_sessions():
+    # Any worker may serve any rerun of a participant, so a session record cached by one
+    # process misses the writes of the others. Only a declared single-process deployment caches them.
+    return os.environ.get("SINGLE_PROCESS_DEPLOYMENT") == "1"
+
+def _responses_embed():
+    return 'session_responses(*)' if uses_packed_storage() else 'trials(*, allocations(*))'
+
+def _select_session(session_id: str):
+    rows = supabase.table('sessions') \
+        .select(f'*, {_responses_embed()}') \
+        .eq('session_id', session_id) \
+        .execute().data
+    return rows[0] if rows else None
+
+def load_session_record(session_id: str):
+    """
+    The session row with its responses embedded ('trials' with nested 'allocations',
+    or 'session_responses' with packed storage), or None for an unknown session.
+    """
+    if not _caches_sessions():
+        return _select_session(session_id)
+    return record_cache.get('session', session_id, lambda: _select_session(session_id))
+
+def create_session_record(row: dict):
+    """Insert a new session row, its record is cached with no responses yet."""
+    created = supabase.table('sessions').insert(row).execute().data
+    if _caches_sessions():
+        record = {**row, **(created[0] if created else {})}
+        record['session_responses' if uses_packed_storage() else 'trials'] = []
+        record_cache.put('session', row['session_id'], record)
+
+def load_trial_sequence(trial_sequence_id):
+    """A trial_sequences row, sequences never change once assigned."""
+    def load():
+        rows = supabase.table('trial_sequences') \
+            .select('*') \
+            .eq('trial_sequence_id', trial_sequence_id) \
+            .execute().data
+        return rows[0] if rows else None
+    return record_cache.get('sequence', trial_sequence_id, load)
+
+def remember_trial_sequences(sequences):
+    for seq in sequences:
+        record_cache.put('sequence', seq['trial_sequence_id'], seq)
+
+def _execute_progress_update(session_id: str, update: dict):
+    supabase.table('sessions').update(update).eq('session_id', session_id).execute()
+    record_cache.update('session', session_id, update)
+
+def _write_session_progress(session_id: str, fields: dict):
+    progress = _current_progress()
+    wait_for_background(session_id)
+    _execute_progress_update(session_id, _progress_update(progress, fields))
+    mark_progress_persisted(progress)
+
+def update_session_progress(session_id: str, **fields):
+    """
+    Update session progress in database, together with the shared state snapshot.
+
+    Writes are skipped if (page, trial, step) did not change and debounced if only
+    the step of a trial changed. Additional session columns can be passed as keyword
+    arguments, they are always written immediately.
+    """
+    progress = _current_progress()
+    persisted = st.session_state.get('persisted_progress')
+    if progress == persisted and not fields:
+        st.session_state.progress_pending_since = None
+        return
+
+    if uses_local_store():
+        # local writes are cheap, keep the shared snapshot current on every change
+        save_snapshot(session_id, snapshot_state(st.session_state))
+
+    if persisted is not None and progress[0] == 'trial' and progress[:2] == persisted[:2] and not fields:
+        if st.session_state.get('progress_pending_since') is None:
+            st.session_state.progress_pending_since = time.monotonic()
+        return
+
+    _write_session_progress(session_id, fields)
+
+def flush_session_progress(session_id: str):
+    """Write a deferred progress update once its debounce window has passed."""
+    pending_since = st.session_state.get('progress_pending_since')
+    if pending_since is not None and time.monotonic() - pending_since >= PROGRESS_DEBOUNCE_SECONDS:
+        _write_session_progress(session_id, {})
+
+def flush_session_progress_in_background(session_id: str):
+    """Like flush_session_progress, but the write does not block the current screen."""
+    pending_since = st.session_state.get('progress_pending_since')
+    if pending_since is None or time.monotonic() - pending_since < PROGRESS_DEBOUNCE_SECONDS:
+        return
+    progress = _current_progress()
+    # not flushed again by the next runs; if the write fails, wait_for_background repeats it
+    st.session_state.progress_pending_since = None
+    schedule(session_id, _write_progress_in_background, get_script_run_ctx().session_state,
+             session_id, progress, _progress_update(progress, {}))
+
+def _write_progress_in_background(state, session_id: str, progress, update: dict):
+    # runs outside the script thread, `state` is the session's SafeSessionState
+    _execute_progress_update(session_id, update)
+    state['persisted_progress'] = progress
+
+def _ensure_trial_id(session_id: str, trial_num):
+    """Return the trial_id of a trial, creating the trial row if needed."""
+    return record_cache.get('trial_id', (session_id, trial_num), lambda: _create_trial(session_id, trial_num))
+
+def _create_trial(session_id: str, trial_num):
+    # Deterministic id, creating the row twice is a no-op
+    trial_id = trial_key(session_id, trial_num)
+    created = supabase.table('trials').upsert({
+        'trial_id': trial_id,
+        'session_id': session_id,
+        'trial_number': trial_num,
+        'created_at': datetime.now(timezone.utc).isoformat()
+    }, on_conflict='session_id,trial_number', ignore_duplicates=True).execute()
+
+    if not created.data:
+        # Row existed already, sessions started before deterministic ids have random trial ids
+        trial_id = supabase.table('trials') \
+            .select('trial_id') \
+            .eq('session_id', session_id) \
+            .eq('trial_number', trial_num) \
+            .execute().data[0]['trial_id']
+    return trial_id
+
+def _cached_trial(session, session_id, trial_num, trial_id):
+    """The trial of a cached normalized session record, added if not there yet"""
+    trials = session.setdefault('trials', [])
+    for trial in trials:
+        if trial['trial_number'] == trial_num:
+            return trial
+    trial = {
+        'trial_id': trial_id,
+        'session_id': session_id,
+        'trial_number': trial_num,
+        'return_a': None,
+        'return_b': None,
+        'allocations': []
+    }
+    trials.append(trial)
+    return trial
+
+def _cached_packed(session, session_id):
+    """The session_responses record of a cached packed session record, added if not there yet"""
+    packed = session.get('session_responses')
+    if isinstance(packed, list):
+        if not packed:
+            packed.append({'session_id': session_id})
+        return packed[0]
+    if not packed:
+        packed = session['session_responses'] = {'session_id': session_id}
+    return packed
+
+def _set_at(record, column, index, value):
+    # 1-based like the Postgres arrays, which grow to the highest written index
+    values = record.get(column) or []
+    values.extend([None] * (index - len(values)))
+    values[index - 1] = value
+    record[column] = values
+
+def prefetch_trial(session_id: str, trial_num):
+    """Create the trial row of an upcoming trial in the background."""
+    if not uses_packed_storage():
+        schedule(session_id, _ensure_trial_id, session_id, trial_num)
 
 def save_allocation(session_id: str, trial_num, allocation_type, fund_a, fund_b, portfolio_return=None):
     """Save allocation to Supabase."""
-    trial_response = supabase.table('trials') \
-        .select('trial_id') \
-        .eq('session_id', session_id) \
-        .eq('trial_number', trial_num) \
-        .execute()
-
-    trial_id = trial_response.data[0]['trial_id'] if trial_response.data else str(uuid.uuid4())
-
-    # If trial doesn't exist yet, create it
-    if not trial_response.data:
-        supabase.table('trials').insert({
-            'trial_id': trial_id,
-            'session_id': session_id,
-            'trial_number': trial_num,
-            'created_at': datetime.now(timezone.utc).isoformat()
+    wait_for_background(session_id)
+    _save_allocation(session_id, trial_num, allocation_type, fund_a, fund_b, portfolio_return)
+
+def save_allocation_in_background(session_id: str, trial_num, allocation_type, fund_a, fund_b, portfolio_return=None):
+    """
+    Save allocation without blocking the rendering of the current screen. Until the write
+    succeeds, the allocation is listed in 'unsaved_allocations' of the state snapshot, so
+    a resume by another worker process sends it again (resend_unsaved_allocations).
+    """
+    key = f"{trial_num}:{allocation_type}"
+    unsaved = st.session_state.setdefault('unsaved_allocations', {})
+    unsaved[key] = [trial_num, allocation_type, fund_a, fund_b, portfolio_return]
+    schedule(session_id, _save_unsaved_allocation, unsaved, key,
+             session_id, trial_num, allocation_type, fund_a, fund_b, portfolio_return)
+
+def _save_unsaved_allocation(unsaved, key, *args):
+    # runs outside the script thread, `unsaved` is the session's 'unsaved_allocations'
+    _save_allocation(*args)
+    unsaved.pop(key, None)
+
+def resend_unsaved_allocations(session_id: str):
+    """Save again the allocations a resumed session lists as unsaved, in the background."""
+    for trial_num, allocation_type, fund_a, fund_b, portfolio_return in \
+            list(st.session_state.get('unsaved_allocations', {}).values()):
+        save_allocation_in_background(session_id, trial_num, allocation_type, fund_a, fund_b, portfolio_return)
+
+def _save_allocation(session_id: str, trial_num, allocation_type, fund_a, fund_b, portfolio_return=None):
+    recorded_at = datetime.now(timezone.utc).isoformat()
+    if uses_packed_storage():
+        index = slot(trial_num, allocation_type)
+        supabase.rpc('record_response', {
+            'p_session_id': session_id,
+            'p_slot': index,
+            'p_fund_a': fund_a,
+            'p_fund_b': fund_b,
+            'p_portfolio_return': portfolio_return
         }).execute()
 
-    supabase.table('allocations').insert({
-        'allocation_id': str(uuid.uuid4()),
+        def apply(session):
+            packed = _cached_packed(session, session_id)
+            for column, value in (('fund_a', fund_a), ('fund_b', fund_b),
+                                  ('portfolio_return', portfolio_return), ('recorded_at', recorded_at)):
+                _set_at(packed, column, index, value)
+        record_cache.update('session', session_id, apply)
+        return
+
+    trial_id = _ensure_trial_id(session_id, trial_num)
+    allocation = {
+        'allocation_id': allocation_key(trial_id, allocation_type),
         'trial_id': trial_id,
         'allocation_type': allocation_type,
         'fund_a': fund_a,
         'fund_b': fund_b,
         'portfolio_return': portfolio_return,
-        'created_at': datetime.now(timezone.utc).isoformat()
-    }).execute()
+        'created_at': recorded_at
+    }
+    # One row per (trial, allocation type): retries and resubmits overwrite instead of duplicating
+    supabase.table('allocations').upsert(allocation, on_conflict='trial_id,allocation_type').execute()
+
+    def apply(session):
+        trial = _cached_trial(session, session_id, trial_num, trial_id)
+        trial['allocations'] = [a for a in trial['allocations'] if a['allocation_type'] != allocation_type]
+        trial['allocations'].append(allocation)
+    record_cache.update('session', session_id, apply)
+
+def save_trial_returns(session_id: str, trial_num, return_a, return_b):
+    """Store the fund returns realized in a trial."""
+    wait_for_background(session_id)
+    if uses_packed_storage():
+        supabase.rpc('record_trial_returns', {
+            'p_session_id': session_id,
+            'p_trial_number': trial_num,
+            'p_return_a': return_a,
+            'p_return_b': return_b
+        }).execute()
+
+        def apply(session):
+            packed = _cached_packed(session, session_id)
+            _set_at(packed, 'return_a', trial_num, return_a)
+            _set_at(packed, 'return_b', trial_num, return_b)
+        record_cache.update('session', session_id, apply)
+        return
+
+    trial_id = _ensure_trial_id(session_id, trial_num)
+    supabase.table('trials').update({
+        'return_a': return_a,
+        'return_b': return_b
+    }).eq('trial_id', trial_id).execute()
+
+    def apply(session):
+        _cached_trial(session, session_id, trial_num, trial_id).update(return_a=return_a, return_b=return_b)
+    record_cache.update('session', session_id, apply)
 
 def save_demographics(session_id: str, data: dict):
     """Save demographic data to Supabase."""
-    supabase.table('demographics').insert({
-        'demographic_id': str(uuid.uuid4()),
+    supabase.table('demographics').upsert({
+        'demographic_id': demographics_key(session_id),
         'session_id': session_id,
         **data,
         'created_at': datetime.now(timezone.utc).isoformat()
 
-    }).execute()
+    }, on_conflict='demographic_id').execute()
 
 def load_session_data(session_id: str):
     """
     Load the session data from 'sessions' table,
     along with trials and their allocations.
     """
-    session_response = supabase.table('sessions').select('*').eq('session_id', session_id).execute()
-    if session_response.data:
-        session_data = session_response.data[0]
-        trials_response = supabase.table('trials').select('*').eq('session_id', session_id).execute()
-
-        fund_returns = {}
-        allocations = {}
-
-        for trial in trials_response.data:
-            fund_returns[trial['trial_number']] = (trial['return_a'], trial['return_b'])
-
-            alloc_response = supabase.table('allocations') \
-                .select('*') \
-                .eq('trial_id', trial['trial_id']) \
-                .execute()
+    session_data = load_session_record(session_id)
+    if session_data is None:
+        return None, {}, {}
 
-            allocations[trial['trial_number']] = {'initial': None, 'ai': None, 'final': None}
-            for alloc in alloc_response.data:
-                allocations[trial['trial_number']][alloc['allocation_type']] = (
-                    alloc['fund_a'],
-                    alloc['fund_b']
-                )
+    if uses_packed_storage():
+        packed = session_data.pop('session_responses', None)
+        trials = as_trial_rows(packed[0] if isinstance(packed, list) and packed else packed or None)
+    else:
+        trials = session_data.pop('trials', None) or []
 
-        return session_data, fund_returns, allocations
+    fund_returns = {}
+    allocations = {}
+    for trial in trials:
+        fund_returns[trial['trial_number']] = (trial['return_a'], trial['return_b'])
+        allocations[trial['trial_number']] = {'initial': None, 'ai': None, 'final': None}
+        for alloc in trial.get('allocations', []):
+            allocations[trial['trial_number']][alloc['allocation_type']] = (
+                alloc['fund_a'],
+                alloc['fund_b']
+            )
 
-    return None, {}, {}
+    return session_data, fund_returns, allocations
@@ -0,0 +1,178 @@
+"""
+Chunked export of the joined sessions/trials/allocations/demographics data.
+
+Sessions are read in session_id order, `chunk_size` at a time, together with the
+trials, allocations and demographics of just those sessions. Only one chunk is
+held in memory, so memory use does not grow with the size of the result.
+"""
+import io
+import csv
+from datetime import timedelta
+import pyarrow as pa
+from modules.database import supabase, uses_packed_storage, fetch_all
+from modules.packed_responses import ALLOCATION_TYPES, as_trial_rows
+
+# (column, Arrow type) of an export row, one row per allocation
+EXPORT_SCHEMA = pa.schema([
+    ('session_id', pa.string()),
+    ('scenario_id', pa.string()),
+    ('trial_sequence_id', pa.string()),
+    ('max_trials', pa.int32()),
+    ('consent_given', pa.bool_()),
+    ('instructed_response_2_passed', pa.bool_()),
+    ('data_quality', pa.bool_()),
+    ('data_quality_comment', pa.string()),
+    ('created_at', pa.string()),
+    ('completed_at', pa.string()),
+    ('trial_number', pa.int32()),
+    ('return_a', pa.float64()),
+    ('return_b', pa.float64()),
+    ('allocation_type', pa.string()),
+    ('fund_a', pa.float64()),
+    ('fund_b', pa.float64()),
+    ('portfolio_return', pa.float64()),
+    ('allocated_at', pa.string()),
+    ('gender', pa.string()),
+    ('age', pa.int32()),
+    ('country', pa.string()),
+    ('education_level', pa.string()),
+    ('ai_proficiency', pa.int32()),
+    ('financial_literacy', pa.int32()),
+])
+EXPORT_COLUMNS = EXPORT_SCHEMA.names
+
+SESSION_COLUMNS = ('session_id', 'scenario_id', 'trial_sequence_id', 'max_trials', 'consent_given',
+                   'instructed_response_2_passed', 'data_quality', 'data_quality_comment',
+                   'created_at', 'completed_at')
+DEMOGRAPHIC_COLUMNS = ('gender', 'age', 'country', 'education_level', 'ai_proficiency', 'financial_literacy')
+
+DEFAULT_CHUNK_SIZE = 200
+
+def _session_query(filters):
+    """
+    Sessions matching the export filters: scenario_id, completed (True/False),
+    data_quality (True/False) and created_from / created_to (dates, inclusive).
+    """
+    query = supabase.table('sessions').select(', '.join(SESSION_COLUMNS))
+    if filters.get('scenario_id'):
+        query = query.eq('scenario_id', filters['scenario_id'])
+    if filters.get('completed') is True:
+        query = query.not_.is_('completed_at', 'null')
+    elif filters.get('completed') is False:
+        query = query.is_('completed_at', 'null')
+    if filters.get('data_quality') is not None:
+        query = query.is_('data_quality', 'true' if filters['data_quality'] else 'false')
+    if filters.get('created_from'):
+        query = query.gte('created_at', filters['created_from'].isoformat())
+    if filters.get('created_to'):
+        query = query.lt('created_at', (filters['created_to'] + timedelta(days=1)).isoformat())
+    return query
+
+def _trials_by_session(session_ids):
+    if uses_packed_storage():
+        records = supabase.table('session_responses').select('*').in_('session_id', session_ids).execute().data
+        return {record['session_id']: as_trial_rows(record) for record in records}
+
+    trials = {}
+    for trial in fetch_all(lambda: supabase.table('trials')
+                           .select('*, allocations(*)')
+                           .in_('session_id', session_ids)
+                           .order('trial_id')):
+        trials.setdefault(trial['session_id'], []).append(trial)
+    return trials
+
+def _rows(session, trials, demographics):
+    base = {column: session.get(column) for column in SESSION_COLUMNS}
+    base.update({column: demographics.get(column) for column in DEMOGRAPHIC_COLUMNS})
+
+    rows = []
+    for trial in sorted(trials, key=lambda t: t['trial_number']):
+        allocations = sorted(trial['allocations'], key=lambda a: ALLOCATION_TYPES.index(a['allocation_type']))
+        for alloc in allocations or [{}]:
+            rows.append({
+                **base,
+                'trial_number': trial['trial_number'],
+                'return_a': trial.get('return_a'),
+                'return_b': trial.get('return_b'),
+                'allocation_type': alloc.get('allocation_type'),
+                'fund_a': alloc.get('fund_a'),
+                'fund_b': alloc.get('fund_b'),
+                'portfolio_return': alloc.get('portfolio_return'),
+                'allocated_at': alloc.get('created_at'),
+            })
+    # sessions without responses keep a row, like a left join
+    return rows or [{column: base.get(column) for column in EXPORT_COLUMNS}]
+
+def export_chunks(filters, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of export rows (dicts with EXPORT_COLUMNS), one list per chunk of sessions"""
+    last_session_id = None
+    while True:
+        query = _session_query(filters)
+        if last_session_id:
+            query = query.gt('session_id', last_session_id)
+        sessions = sorted(query.order('session_id').limit(chunk_size).execute().data,
+                          key=lambda s: s['session_id'])
+        if not sessions:
+            return
+        last_session_id = sessions[-1]['session_id']
+
+        session_ids = [s['session_id'] for s in sessions]
+        trials = _trials_by_session(session_ids)
+        demographics = {
+            d['session_id']: d for d in
+            supabase.table('demographics').select('*').in_('session_id', session_ids).execute().data
+        }
+        yield [
+            row
+            for session in sessions
+            for row in _rows(session, trials.get(session['session_id'], []), demographics.get(session['session_id'], {}))
+        ]
+
+def csv_stream(chunks):
+    """Encode row chunks as CSV, yielding bytes per chunk (the header first)"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+class _Sink:
+    """Minimal writable file that hands out what was written since the last take()"""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+def arrow_stream(chunks):
+    """Encode row chunks as an Arrow IPC stream, yielding bytes per record batch"""
+    sink = _Sink()
+    with pa.ipc.new_stream(sink, EXPORT_SCHEMA) as writer:
+        yield sink.take()
+        for rows in chunks:
+            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=EXPORT_SCHEMA))
+            yield sink.take()
+    yield sink.take()
+
+# format -> (encoder, content type, file extension)
+FORMATS = {
+    'csv': (csv_stream, "text/csv; charset=utf-8", "csv"),
+    'arrow': (arrow_stream, "application/vnd.apache.arrow.stream", "arrows"),
+}
@@ -0,0 +1,92 @@
+"""
+Download server of the study data export.
+
+Streamlit has no API for routes of its own, so the export is served by this small
+Tornado process next to the app. Its route exists from the start, a scripted export
+right after a deploy gets CSV or Arrow, never the app's page. Run from the
+repository root:
+
+    python -m modules.export_server --port 8502
+"""
+import os
+import hmac
+import asyncio
+import argparse
+from datetime import date
+import tornado.web
+from tornado.ioloop import IOLoop
+from tornado.iostream import StreamClosedError
+from modules.export import export_chunks, FORMATS
+
+# Route of the streaming download
+EXPORT_PATH = "export/responses"
+
+def is_admin_token(given):
+    token = os.environ.get("ADMIN_TOKEN")
+    return bool(token) and given is not None and hmac.compare_digest(given, token)
+
+def _export_filters(argument):
+    """Export filters from the query arguments of a download request"""
+    completed = argument('completed', None)
+    data_quality = argument('data_quality', None)
+    created_from, created_to = argument('from', None), argument('to', None)
+    return {
+        'scenario_id': argument('scenario_id', None),
+        'completed': {'yes': True, 'no': False}.get(completed),
+        'data_quality': {'true': True, 'false': False}.get(data_quality),
+        'created_from': date.fromisoformat(created_from) if created_from else None,
+        'created_to': date.fromisoformat(created_to) if created_to else None,
+    }
+
+class ExportHandler(tornado.web.RequestHandler):
+    """
+    Streams the export chunk by chunk. Chunks are read from the database in a thread
+    (the client is blocking), and the next one is only read after the previous one
+    was flushed to the socket, so a slow download does not pile up in memory.
+    """
+
+    async def get(self):
+        if not is_admin_token(self.get_query_argument('admin', None)):
+            raise tornado.web.HTTPError(403)
+        export_format = self.get_query_argument('format', 'csv')
+        if export_format not in FORMATS:
+            raise tornado.web.HTTPError(400, reason="Unknown format")
+        try:
+            filters = _export_filters(self.get_query_argument)
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="Invalid date")
+
+        encode, content_type, extension = FORMATS[export_format]
+        self.set_header("Content-Type", content_type)
+        self.set_header("Content-Disposition", f'attachment; filename="study_export.{extension}"')
+        self.set_header("Cache-Control", "no-store")
+
+        stream = encode(export_chunks(filters))
+        loop = IOLoop.current()
+        try:
+            while (data := await loop.run_in_executor(None, next, stream, None)) is not None:
+                if data:
+                    self.write(data)
+                    await self.flush()
+        except StreamClosedError:
+            pass  # download cancelled
+        finally:
+            stream.close()
+
+def make_app():
+    return tornado.web.Application([(f"/{EXPORT_PATH}", ExportHandler)])
+
+async def serve(port, address):
+    make_app().listen(port, address)
+    print(f"Serving /{EXPORT_PATH} on {address or '*'}:{port}", flush=True)
+    await asyncio.Event().wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=int(os.environ.get("EXPORT_PORT", 8502)))
+    parser.add_argument('--address', default="", help="interface to listen on, all by default")
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.address))
+
+if __name__ == "__main__":
+    main()
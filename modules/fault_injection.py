@@ -0,0 +1,156 @@
+"""
+Fault injection for the Supabase client, enabled with FAULT_INJECTION.
+
+FAULT_INJECTION is a JSON profile or the path of a JSON file. Every request
+(`.execute()` of a table query or RPC) is matched against the rules by table
+and verb (select, insert, upsert, update, delete, rpc; "*" matches any); the
+first matching rule applies, the "default" profile otherwise:
+
+    {
+      "seed": 1,
+      "default": {"latency": {"median_ms": 150, "sigma": 0.5}},
+      "rules": [
+        {"table": "allocations", "verb": "upsert", "error_rate": 0.05, "lost_response_rate": 0.05},
+        {"table": "sessions", "verb": "update", "latency": {"fixed_ms": 2000}},
+        {"table": "*", "verb": "*", "stall_rate": 0.01, "stall_seconds": 30}
+      ]
+    }
+
+A profile has
+- latency: {"fixed_ms": x}, {"min_ms": x, "max_ms": y} (uniform) or
+  {"median_ms": x, "sigma": s} (log-normal), added to every request
+- error_rate: share of requests that fail before reaching the database
+- lost_response_rate: share of requests that are executed but whose response is lost
+- stall_rate, stall_seconds: share of requests that hang and then time out
+"""
+import os
+import json
+import time
+import random
+import threading
+from collections import Counter
+import httpx
+from postgrest.exceptions import APIError
+
+VERBS = ('select', 'insert', 'upsert', 'update', 'delete')
+
+def load_fault_config(value):
+    """Parse FAULT_INJECTION: inline JSON or the path of a JSON file"""
+    if value.lstrip().startswith('{'):
+        return json.loads(value)
+    with open(value, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+class FaultInjector:
+    """Decides and applies the faults of each request, thread-safe and reproducible with a seed."""
+
+    def __init__(self, config):
+        self.default = config.get('default', {})
+        self.rules = config.get('rules', [])
+        self._random = random.Random(config.get('seed'))
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def _profile(self, table, verb):
+        for rule in self.rules:
+            if rule.get('table', '*') in ('*', table) and rule.get('verb', '*') in ('*', verb):
+                return rule
+        return self.default
+
+    def _latency(self, latency):
+        if not latency:
+            return 0.0
+        if 'fixed_ms' in latency:
+            ms = latency['fixed_ms']
+        elif 'max_ms' in latency:
+            ms = self._random.uniform(latency.get('min_ms', 0), latency['max_ms'])
+        else:
+            ms = self._random.lognormvariate(0, latency.get('sigma', 0.5)) * latency['median_ms']
+        return ms / 1000
+
+    def _decide(self, table, verb):
+        """(delay seconds, fault) with fault one of None, 'error', 'lost_response', 'stall'"""
+        profile = self._profile(table, verb)
+        with self._lock:
+            delay = self._latency(profile.get('latency'))
+            draw = self._random.random()
+            fault = None
+            for kind in ('stall', 'error', 'lost_response'):
+                rate = profile.get(f'{kind}_rate', 0)
+                if draw < rate:
+                    fault = kind
+                    break
+                draw -= rate
+            self._counts[(table, verb, fault or 'ok')] += 1
+        if fault == 'stall':
+            delay += profile.get('stall_seconds', 30)
+        return delay, fault
+
+    def execute(self, table, verb, request):
+        delay, fault = self._decide(table, verb)
+        time.sleep(delay)
+        if fault == 'stall':
+            raise httpx.ReadTimeout(f"Injected stall: {verb} {table}")
+        if fault == 'error':
+            raise APIError({'message': f"Injected error: {verb} {table}", 'code': '503', 'hint': None, 'details': None})
+        response = request.execute()
+        if fault == 'lost_response':
+            raise httpx.ReadTimeout(f"Injected lost response: {verb} {table}")
+        return response
+
+    def stats(self):
+        """Requests per (table, verb, outcome) so far"""
+        with self._lock:
+            return dict(self._counts)
+
+class _FaultyRequest:
+    """Wraps a query builder, tracking the verb until .execute()"""
+
+    def __init__(self, injector, table, verb, request):
+        self._injector = injector
+        self._table = table
+        self._verb = verb
+        self._request = request
+
+    def __getattr__(self, name):
+        attr = getattr(self._request, name)
+        if not callable(attr):
+            # e.g. the not_ property returns the builder itself
+            return _FaultyRequest(self._injector, self._table, self._verb, attr) \
+                if hasattr(attr, 'execute') else attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if not hasattr(result, 'execute'):
+                return result
+            verb = name if name in VERBS else self._verb
+            return _FaultyRequest(self._injector, self._table, verb, result)
+        return call
+
+    def execute(self):
+        return self._injector.execute(self._table, self._verb, self._request)
+
+class FaultyClient:
+    """The Supabase client with the faults of an injector applied to every request"""
+
+    def __init__(self, client, injector):
+        self.wrapped = client
+        self.injector = injector
+
+    def table(self, name):
+        return _FaultyRequest(self.injector, name, 'select', self.wrapped.table(name))
+
+    def rpc(self, name, params=None, **kwargs):
+        return _FaultyRequest(self.injector, name, 'rpc', self.wrapped.rpc(name, params, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+def with_faults(client, config=None):
+    """Wrap a client with the given profile, or the FAULT_INJECTION profile if none is given"""
+    if config is None:
+        value = os.environ.get("FAULT_INJECTION")
+        if not value:
+            return client
+        config = load_fault_config(value)
+    return FaultyClient(client, FaultInjector(config))
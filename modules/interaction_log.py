@@ -0,0 +1,71 @@
+import os
+import time
+import streamlit as st
+from modules.database import supabase
+
+# Keyed widgets whose values are recorded (participant inputs)
+WIDGET_KEY_PREFIXES = ('initial_a_', 'final_a_', 'instructed_a_', 'demo_initial_a', 'adjusted_a')
+# Buffered events are appended to the log after this many runs and on every page change
+FLUSH_EVERY = 20
+# Events kept for a retry while appending fails, the oldest are dropped beyond this
+MAX_PENDING_EVENTS = 500
+
+# Event layout: [think_ms, page, trial, trial_step, changed widget values, transitioned]
+THINK_MS, PAGE, TRIAL, STEP, WIDGETS, TRANSITIONED = range(6)
+
+def recording_enabled():
+    return os.environ.get("RECORD_INTERACTIONS") == "1"
+
+def _screen():
+    return (st.session_state.page, st.session_state.trial, st.session_state.trial_step)
+
+def _widget_values():
+    return {
+        key: value for key, value in st.session_state.items()
+        if isinstance(key, str) and key.startswith(WIDGET_KEY_PREFIXES)
+    }
+
+def begin_run():
+    """Remember the screen this script run starts on"""
+    if not recording_enabled():
+        return
+    st.session_state.run_screen = _screen()
+    st.session_state.run_started = time.monotonic()
+
+def end_run(session_id):
+    """Record the script run as an event: time since the previous run, the screen, changed inputs"""
+    if not recording_enabled() or 'run_screen' not in st.session_state:
+        return
+
+    screen = st.session_state.run_screen
+    previous_end = st.session_state.get('last_run_ended', st.session_state.run_started)
+    widgets = _widget_values()
+    last_widgets = st.session_state.get('recorded_widgets', {})
+    changed = {key: value for key, value in widgets.items() if last_widgets.get(key) != value}
+    transitioned = _screen() != screen
+
+    events = st.session_state.setdefault('pending_events', [])
+    events.append([
+        int((st.session_state.run_started - previous_end) * 1000),
+        screen[0], screen[1], screen[2],
+        changed,
+        int(transitioned)
+    ])
+    st.session_state.recorded_widgets = widgets
+    st.session_state.last_run_ended = time.monotonic()
+    del st.session_state['run_screen']
+
+    if len(events) > MAX_PENDING_EVENTS:
+        del events[:-MAX_PENDING_EVENTS]
+
+    # after a failed append, every run retries until it goes through
+    if len(events) >= FLUSH_EVERY or (transitioned and _screen()[0] != screen[0]) \
+            or st.session_state.get('events_unsent'):
+        st.session_state.events_unsent = True
+        supabase.rpc('append_interaction_events', {
+            'p_session_id': session_id,
+            'p_max_trials': st.session_state.max_trials,
+            'p_events': events
+        }).execute()
+        st.session_state.pending_events = []
+        st.session_state.events_unsent = False
@@ -0,0 +1,316 @@
+"""
+In-memory stand-in for the Supabase client, used with SUPABASE_URL=local.
+
+Implements the subset of the query builder the app uses (select with embedded
+relations, eq/is_/in_/gt/gte/lt/lte and not_ filters, order/limit/range, insert,
+upsert, update, delete and the RPCs from the README) and is seeded with a
+synthetic study configuration.
+"""
+import re
+import copy
+import uuid
+import random
+import threading
+from datetime import datetime, timezone
+
+# Primary key per table; embedded relations are joined on the parent's primary key
+PRIMARY_KEYS = {
+    'scenario_config': 'scenario_id',
+    'fund_returns': 'fund_return_id',
+    'ai_recommendations': 'recommendation_id',
+    'trial_sequences': 'trial_sequence_id',
+    'sessions': 'session_id',
+    'trials': 'trial_id',
+    'allocations': 'allocation_id',
+    'demographics': 'demographic_id',
+    'session_responses': 'session_id',
+    'interaction_logs': 'session_id',
+    'client_timings': 'timing_id',
+}
+
+# Column defaults of the README schema that the app relies on when reading rows back
+DEFAULTS = {
+    'sessions': {
+        'consent_given': False, 'instructed_response_2_passed': None, 'data_quality': None,
+        'data_quality_comment': None, 'state_snapshot': None, 'final_outcome': None,
+        'completed_at': None
+    },
+    'trials': {'return_a': None, 'return_b': None},
+}
+
+_EMBED = re.compile(r'(\w+)\(((?:[^()]|\([^()]*\))*)\)')
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+class _Query:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.op = 'select'
+        self.columns = '*'
+        self.payload = None
+        self.filters = []
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.ordering = []
+        self.window = None
+        self.negate = False
+
+    def select(self, columns='*', **kwargs):
+        self.op, self.columns = 'select', columns
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.op, self.payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self.op, self.payload = 'upsert', payload
+        self.on_conflict, self.ignore_duplicates = on_conflict, ignore_duplicates
+        return self
+
+    def update(self, payload, **kwargs):
+        self.op, self.payload = 'update', payload
+        return self
+
+    def delete(self, **kwargs):
+        self.op = 'delete'
+        return self
+
+    def _filter(self, predicate):
+        if self.negate:
+            self.negate = False
+            self.filters.append(lambda row: not predicate(row))
+        else:
+            self.filters.append(predicate)
+        return self
+
+    @property
+    def not_(self):
+        self.negate = True
+        return self
+
+    def eq(self, column, value):
+        return self._filter(lambda row: row.get(column) == value)
+
+    def is_(self, column, value):
+        # PostgREST's is.null / is.true / is.false
+        expected = {'null': None, 'true': True, 'false': False}.get(str(value).lower(), value)
+        return self._filter(lambda row: row.get(column) is expected)
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._filter(lambda row: row.get(column) in values)
+
+    def gt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) > value)
+
+    def gte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) >= value)
+
+    def lt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) < value)
+
+    def lte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) <= value)
+
+    def order(self, column, desc=False, **kwargs):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, size, **kwargs):
+        self.window = (0, size)
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.window = (start, end - start + 1)
+        return self
+
+    def execute(self):
+        with self.client.lock:
+            return _Response(getattr(self.client, '_' + self.op)(self))
+
+class LocalSupabase:
+    """Thread-safe in-memory tables behind a Supabase-like interface."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables = {name: [] for name in PRIMARY_KEYS}
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def rpc(self, name, params):
+        client = self
+
+        class _Call:
+            def execute(self):
+                with client.lock:
+                    return _Response(getattr(client, '_rpc_' + name)(**params))
+        return _Call()
+
+    # --- table operations ---------------------------------------------------------
+
+    def _matching(self, query):
+        return [row for row in self.tables.setdefault(query.table, []) if all(f(row) for f in query.filters)]
+
+    def _new_row(self, table, row):
+        full = dict(DEFAULTS.get(table, {}))
+        full.update(copy.deepcopy(row))
+        if table in ('sessions', 'interaction_logs'):
+            full.setdefault('updated_at', datetime.now(timezone.utc).isoformat())
+        self.tables.setdefault(table, []).append(full)
+        return full
+
+    def _select(self, query):
+        rows = self._matching(query)
+        for column, desc in reversed(query.ordering):
+            rows = sorted(rows, key=lambda row: row.get(column), reverse=desc)
+        if query.window:
+            start, size = query.window
+            rows = rows[start:start + size]
+        return self._embed(query.table, [copy.deepcopy(row) for row in rows], query.columns)
+
+    def _insert(self, query):
+        rows = query.payload if isinstance(query.payload, list) else [query.payload]
+        return [copy.deepcopy(self._new_row(query.table, row)) for row in rows]
+
+    def _upsert(self, query):
+        rows = query.payload if isinstance(query.payload, list) else [query.payload]
+        keys = (query.on_conflict or PRIMARY_KEYS[query.table]).split(',')
+        written = []
+        for row in rows:
+            existing = next((r for r in self.tables.setdefault(query.table, [])
+                             if all(r.get(k) == row.get(k) for k in keys)), None)
+            if existing is None:
+                written.append(copy.deepcopy(self._new_row(query.table, row)))
+            elif not query.ignore_duplicates:
+                existing.update(copy.deepcopy(row))
+                written.append(copy.deepcopy(existing))
+        return written
+
+    def _update(self, query):
+        rows = self._matching(query)
+        for row in rows:
+            row.update(copy.deepcopy(query.payload))
+            if query.table == 'sessions':
+                row['updated_at'] = datetime.now(timezone.utc).isoformat()
+        return copy.deepcopy(rows)
+
+    def _delete(self, query):
+        rows = self._matching(query)
+        self.tables[query.table] = [row for row in self.tables[query.table] if row not in rows]
+        return rows
+
+    def _embed(self, table, rows, columns):
+        # one pass over each child table for all parent rows, not one per parent
+        for match in _EMBED.finditer(columns):
+            child, child_columns = match.group(1), match.group(2)
+            parent_key = PRIMARY_KEYS[table]
+            by_parent = {row[parent_key]: [] for row in rows}
+            for c in self.tables.get(child, []):
+                if c.get(parent_key) in by_parent:
+                    by_parent[c[parent_key]].append(copy.deepcopy(c))
+            self._embed(child, [c for children in by_parent.values() for c in children], child_columns)
+            for row in rows:
+                row[child] = by_parent[row[parent_key]]
+        return rows
+
+    # --- RPCs (see README) --------------------------------------------------------
+
+    def _packed(self, session_id):
+        for row in self.tables['session_responses']:
+            if row['session_id'] == session_id:
+                return row
+        return self._new_row('session_responses', {
+            'session_id': session_id, 'fund_a': [], 'fund_b': [], 'portfolio_return': [],
+            'recorded_at': [], 'return_a': [], 'return_b': []
+        })
+
+    @staticmethod
+    def _set(values, index, value):
+        values.extend([None] * (index - len(values)))
+        values[index - 1] = value
+
+    def _rpc_record_response(self, p_session_id, p_slot, p_fund_a, p_fund_b, p_portfolio_return):
+        row = self._packed(p_session_id)
+        now = datetime.now(timezone.utc).isoformat()
+        for column, value in (('fund_a', p_fund_a), ('fund_b', p_fund_b),
+                              ('portfolio_return', p_portfolio_return), ('recorded_at', now)):
+            self._set(row[column], p_slot, value)
+
+    def _rpc_record_trial_returns(self, p_session_id, p_trial_number, p_return_a, p_return_b):
+        row = self._packed(p_session_id)
+        self._set(row['return_a'], p_trial_number, p_return_a)
+        self._set(row['return_b'], p_trial_number, p_return_b)
+
+    def _rpc_backfill_allocation_returns(self, p_updates):
+        by_id = {row['allocation_id']: row for row in self.tables['allocations']}
+        updated = 0
+        for update in p_updates:
+            row = by_id.get(update['allocation_id'])
+            if row is not None and row.get('portfolio_return') is None \
+                    and (row['fund_a'], row['fund_b']) == (update['fund_a'], update['fund_b']):
+                row['portfolio_return'] = update['portfolio_return']
+                updated += 1
+        return updated
+
+    def _rpc_backfill_packed_returns(self, p_updates):
+        rows = {row['session_id']: row for row in self.tables['session_responses']}
+        updated = 0
+        for update in p_updates:
+            row, index = rows.get(update['session_id']), update['slot'] - 1
+            if row is None or index >= len(row['fund_a']):
+                continue
+            returns = row['portfolio_return']
+            if (index >= len(returns) or returns[index] is None) \
+                    and (row['fund_a'][index], row['fund_b'][index]) == (update['fund_a'], update['fund_b']):
+                self._set(returns, update['slot'], update['portfolio_return'])
+                updated += 1
+        return updated
+
+    def _rpc_append_interaction_events(self, p_session_id, p_max_trials, p_events):
+        for row in self.tables['interaction_logs']:
+            if row['session_id'] == p_session_id:
+                row['events'].extend(copy.deepcopy(p_events))
+                row['updated_at'] = datetime.now(timezone.utc).isoformat()
+                return
+        self._new_row('interaction_logs', {
+            'session_id': p_session_id, 'max_trials': p_max_trials, 'events': list(p_events)
+        })
+
+    # --- seeding ------------------------------------------------------------------
+
+    @classmethod
+    def seeded(cls, num_sequences=10, seed=0):
+        """A client with the four study scenarios, their returns and AI recommendations"""
+        client = cls()
+        rnd = random.Random(seed)
+        for i, (ai_type, num_trials) in enumerate([('balanced', 5), ('unbalanced', 5),
+                                                    ('balanced', 100), ('unbalanced', 100)]):
+            scenario_id = str(uuid.UUID(int=i + 1))
+            client.tables['scenario_config'].append({
+                'scenario_id': scenario_id, 'scenario_name': f"{ai_type}-{num_trials}",
+                'ai_type': ai_type, 'num_trials': num_trials, 'periods_per_trial': 1, 'description': ''
+            })
+            for trial in range(1, num_trials + 1):
+                client.tables['fund_returns'].append({
+                    'fund_return_id': str(uuid.UUID(int=rnd.getrandbits(128))), 'scenario_id': scenario_id,
+                    'trial_number': trial, 'return_a': rnd.uniform(-0.3, 0.5), 'return_b': rnd.uniform(-0.05, 0.1)
+                })
+                ai_a = rnd.randint(0, 100)
+                client.tables['ai_recommendations'].append({
+                    'recommendation_id': str(uuid.UUID(int=rnd.getrandbits(128))), 'scenario_id': scenario_id,
+                    'trial_number': trial, 'fund_a': ai_a, 'fund_b': 100 - ai_a
+                })
+        for _ in range(num_sequences):
+            five_year, three_month = list(range(1, 6)), list(range(1, 101))
+            rnd.shuffle(five_year)
+            rnd.shuffle(three_month)
+            client.tables['trial_sequences'].append({
+                'trial_sequence_id': str(uuid.UUID(int=rnd.getrandbits(128))),
+                'five_year_trials': five_year, 'three_month_trials': three_month
+            })
+        return client
@@ -0,0 +1,90 @@
+import time
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from modules.session import occupies_assignment
+from modules.database import fetch_all
+
+# Minimum time between two polls of the sessions table, shared by all dashboard viewers
+REFRESH_TTL_SECONDS = 10
+# Overlap of consecutive polls, so rows committed during a poll are not missed
+POLL_OVERLAP = timedelta(seconds=5)
+# Lock window used by get_session_config when assigning new sessions
+LOCK_WINDOW_HOURS = 1.5
+
+MONITORED_COLUMNS = (
+    'session_id, scenario_id, trial_sequence_id, current_page, current_trial, max_trials, '
+    'instructed_response_2_passed, data_quality, created_at, completed_at, updated_at'
+)
+
+class StudyMonitor:
+    """
+    Incrementally maintained copy of the monitored session columns.
+
+    Each refresh only fetches rows whose updated_at is newer than the last poll,
+    the aggregates are computed from the in-memory copy.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._watermark = None
+        self._last_refresh = 0.0
+        self.last_poll_rows = 0
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and time.monotonic() - self._last_refresh < REFRESH_TTL_SECONDS:
+                return
+            started = datetime.now(timezone.utc)
+            since = self._watermark - POLL_OVERLAP if self._watermark is not None else None
+
+            def query():
+                query = self.client.table('sessions').select(MONITORED_COLUMNS)
+                if since is not None:
+                    query = query.gte('updated_at', since.isoformat())
+                # stable order, so the ranges of fetch_all neither skip nor repeat rows
+                return query.order('session_id')
+            rows = fetch_all(query)
+
+            for row in rows:
+                self._sessions[row['session_id']] = row
+            self._watermark = started
+            self._last_refresh = time.monotonic()
+            self.last_poll_rows = len(rows)
+
+    def aggregates(self, scenarios, sequence_ids):
+        """Progress, assignment grid and quality rates of all sessions"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+
+        lock_threshold = datetime.now(timezone.utc) - timedelta(hours=LOCK_WINDOW_HOURS)
+        names = {s['scenario_id']: s['scenario_name'] for s in scenarios}
+
+        pages = Counter(s['current_page'] for s in sessions)
+        trials = Counter(
+            (s['max_trials'], s['current_trial']) for s in sessions
+            if s['current_page'] == 'trial'
+        )
+        grid = {seq_id: {name: 0 for name in names.values()} for seq_id in sequence_ids}
+        for s in sessions:
+            if occupies_assignment(s, lock_threshold) and s['trial_sequence_id'] in grid:
+                grid[s['trial_sequence_id']][names.get(s['scenario_id'], s['scenario_id'])] += 1
+
+        completed = [s for s in sessions if s['completed_at'] is not None]
+        checked = [s for s in sessions if s['instructed_response_2_passed'] is not None]
+        return {
+            'sessions': len(sessions),
+            'pages': dict(pages),
+            'trials': dict(trials),
+            'grid': grid,
+            'completion_rate': len(completed) / len(sessions) if sessions else 0.0,
+            'data_quality_rate': (
+                sum(s['data_quality'] is True for s in completed) / len(completed) if completed else 0.0
+            ),
+            'instructed_pass_rate': (
+                sum(s['instructed_response_2_passed'] is True for s in checked) / len(checked) if checked else 0.0
+            ),
+            'last_poll_rows': self.last_poll_rows,
+        }
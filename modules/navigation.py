@@ -0,0 +1,61 @@
+import streamlit as st
+from modules.subpages.consent import show_consent
+from modules.subpages.intro import show_intro
+from modules.subpages.demo import handle_demo_steps
+from modules.subpages.trial_steps import handle_trial_steps
+from modules.subpages.final import show_final
+from modules.subpages.debrief import show_debrief
+
+# Page -> function rendering its current screen
+SCREENS = {
+    'consent': show_consent,
+    'intro': show_intro,
+    'demo': handle_demo_steps,
+    'trial': handle_trial_steps,
+    'final': show_final,
+    'debrief': show_debrief,
+}
+
+# Declared transitions, (page, step) -> screens one participant action can lead to.
+# The step only tells the screens of the demo and trial pages apart.
+TRANSITIONS = {
+    ('consent', None): {('intro', None)},
+    ('intro', None): {('demo', 1)},
+    ('demo', 1): {('demo', 2)},
+    ('demo', 2): {('demo', 3)},
+    ('demo', 3): {('trial', 1)},
+    ('trial', 1): {('trial', 2), ('trial', 4), ('final', None)},  # 'final': trial past max_trials
+    ('trial', 4): {('trial', 2)},
+    ('trial', 2): {('trial', 3)},
+    ('trial', 3): {('trial', 1), ('final', None)},
+    ('final', None): {('debrief', None)},
+}
+# A click moves on by one screen, the trial page may then forward to 'final' once
+MAX_TRANSITIONS_PER_RUN = 2
+
+def _screen():
+    page = st.session_state.page
+    step = st.session_state.trial_step if page in ('demo', 'trial') else None
+    return page, step, st.session_state.trial
+
+def render_current_screen():
+    """
+    Render the participant's current screen and return its page.
+
+    Submit handlers move the participant on by updating page / trial / trial_step
+    and returning. The next screen is then rendered in the same script run,
+    replacing the previous one in its placeholder, instead of a second run via st.rerun().
+    """
+    slot = st.empty()
+    screen = _screen()
+    for _ in range(MAX_TRANSITIONS_PER_RUN + 1):
+        with slot.container():
+            SCREENS[screen[0]]()
+
+        next_screen = _screen()
+        if next_screen == screen:
+            return screen[0]
+        if next_screen[:2] not in TRANSITIONS.get(screen[:2], ()):
+            raise RuntimeError(f"Undeclared transition from {screen[:2]} to {next_screen[:2]}")
+        screen = next_screen
+    raise RuntimeError(f"More than {MAX_TRANSITIONS_PER_RUN} transitions in one run, last screen {screen[:2]}")
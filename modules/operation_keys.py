@@ -0,0 +1,16 @@
+import uuid
+
+# Namespace of the deterministic ids below, never change it: stored rows are keyed by these ids
+_NAMESPACE = uuid.UUID('6f1c2b1e-5d0a-4c41-9a58-0b8f3f4a2d17')
+
+def trial_key(session_id, trial_num):
+    """Deterministic trial_id of (session, trial number)"""
+    return str(uuid.uuid5(_NAMESPACE, f"{session_id}/{trial_num}"))
+
+def allocation_key(trial_id, allocation_type):
+    """Deterministic allocation_id of (trial, allocation type)"""
+    return str(uuid.uuid5(_NAMESPACE, f"{trial_id}/{allocation_type}"))
+
+def demographics_key(session_id):
+    """Deterministic demographic_id, one demographics row per session"""
+    return str(uuid.uuid5(_NAMESPACE, f"{session_id}/demographics"))
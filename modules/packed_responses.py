@@ -0,0 +1,75 @@
+"""
+Packed per-session response storage.
+
+All responses of a session live in one 'session_responses' row with fixed-layout
+arrays: the allocation of (trial_number, allocation_type) is stored at index
+slot(trial_number, allocation_type) of fund_a / fund_b / portfolio_return /
+recorded_at, the fund returns of a trial at index trial_number of return_a / return_b.
+"""
+from modules.operation_keys import trial_key, allocation_key
+
+ALLOCATION_TYPES = ('initial', 'ai', 'final', 'last-50y')
+
+def slot(trial_number, allocation_type):
+    """1-based array index (Postgres arrays) of a response."""
+    return (trial_number - 1) * len(ALLOCATION_TYPES) + ALLOCATION_TYPES.index(allocation_type) + 1
+
+def _at(values, index):
+    # arrays are only as long as the highest written index
+    values = values or []
+    return values[index - 1] if index <= len(values) else None
+
+def as_trial_rows(record):
+    """
+    Expand a packed record into today's normalized layout: one 'trials' row per
+    trial with its 'allocations' rows nested, as returned by the joined select.
+    """
+    if not record:
+        return []
+
+    session_id = record['session_id']
+    fund_a, fund_b = record.get('fund_a') or [], record.get('fund_b') or []
+    num_trials = max(
+        (len(fund_a) + len(ALLOCATION_TYPES) - 1) // len(ALLOCATION_TYPES),
+        len(record.get('return_a') or [])
+    )
+
+    trials = []
+    for trial_number in range(1, num_trials + 1):
+        trial_id = trial_key(session_id, trial_number)
+        allocations = []
+        for allocation_type in ALLOCATION_TYPES:
+            index = slot(trial_number, allocation_type)
+            if _at(fund_a, index) is None:
+                continue
+            allocations.append({
+                'allocation_id': allocation_key(trial_id, allocation_type),
+                'trial_id': trial_id,
+                'allocation_type': allocation_type,
+                'fund_a': _at(fund_a, index),
+                'fund_b': _at(fund_b, index),
+                'portfolio_return': _at(record.get('portfolio_return'), index),
+                'created_at': _at(record.get('recorded_at'), index)
+            })
+
+        return_a = _at(record.get('return_a'), trial_number)
+        if not allocations and return_a is None:
+            continue
+        trials.append({
+            'trial_id': trial_id,
+            'session_id': session_id,
+            'trial_number': trial_number,
+            'return_a': return_a,
+            'return_b': _at(record.get('return_b'), trial_number),
+            'created_at': min((a['created_at'] for a in allocations if a['created_at']), default=None),
+            'allocations': allocations
+        })
+    return trials
+
+def to_normalized_rows(record):
+    """Flatten a packed record into ('trials' rows, 'allocations' rows) for analysis."""
+    trials, allocations = [], []
+    for trial in as_trial_rows(record):
+        allocations.extend(trial.pop('allocations'))
+        trials.append(trial)
+    return trials, allocations
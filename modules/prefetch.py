@@ -0,0 +1,94 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Background threads per process for work prepared while participants read a screen
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", 4))
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+_lock = threading.Lock()
+_pending = {}
+# session_id -> (time of the last failure, [(fn, args)]) of background work that failed,
+# repeated by wait_for_background
+_failed = {}
+# Failed work of sessions that did not come back within this time (e.g. closed tabs, or
+# participants resumed by another worker process) is dropped
+FAILED_TTL_SECONDS = int(os.environ.get("PREFETCH_FAILED_TTL_SECONDS", 3600))
+
+def _prune(now):
+    # called with _lock held; finished work needs no waiting, its failures are in _failed
+    for session_id, future in list(_pending.items()):
+        if future.done():
+            del _pending[session_id]
+    for session_id, (failed_at, work) in list(_failed.items()):
+        if now - failed_at > FAILED_TTL_SECONDS:
+            del _failed[session_id]
+            logger.warning("Dropping %d failed background writes of session %s", len(work), session_id)
+
+def _run_after(session_id, previous, fn, args):
+    # the executor queue is FIFO, so `previous` is already running or done here
+    if previous is not None:
+        try:
+            previous.result()
+        except Exception:
+            pass
+    try:
+        return fn(*args)
+    except Exception:
+        logger.exception("Background work for session %s failed, repeating it in the foreground", session_id)
+        with _lock:
+            _, work = _failed.get(session_id, (None, []))
+            _failed[session_id] = (time.monotonic(), work + [(fn, args)])
+        raise
+
+def schedule(session_id, fn, *args):
+    """Run fn(*args) in the background, after earlier background work of the same session."""
+    with _lock:
+        _prune(time.monotonic())
+        future = _executor.submit(_run_after, session_id, _pending.get(session_id), fn, args)
+        _pending[session_id] = future
+    return future
+
+def _log_failure(fn, args):
+    try:
+        return fn(*args)
+    except Exception:
+        logger.exception("Background warm-up %s failed", getattr(fn, '__name__', fn))
+        raise
+
+def warm_up(fn, *args):
+    """
+    Run fn(*args) in the background, outside the order of any session's work: nothing
+    waits for it and failures are only logged (e.g. filling a process-wide cache).
+    """
+    return _executor.submit(_log_failure, fn, args)
+
+def wait_for_background(session_id):
+    """
+    Block until the background work of a session is done, so foreground writes keep
+    their order. Work that failed in the background is then repeated here, in its
+    original order; if it fails again, the error is raised to the caller and the
+    remaining work is kept for the next call, at most FAILED_TTL_SECONDS.
+    """
+    with _lock:
+        future = _pending.pop(session_id, None)
+    if future is not None:
+        try:
+            future.result()
+        except Exception:
+            pass  # recorded in _failed by _run_after
+
+    with _lock:
+        _, failed = _failed.pop(session_id, (None, []))
+    for i, (fn, args) in enumerate(failed):
+        try:
+            fn(*args)
+        except Exception:
+            with _lock:
+                _, later = _failed.get(session_id, (None, []))
+                _failed[session_id] = (time.monotonic(), failed[i:] + later)
+            raise
@@ -0,0 +1,99 @@
+import os
+import copy
+import time
+import threading
+from collections import OrderedDict, Counter
+
+# Max. number of cached records per process (all kinds together), least recently used go first
+MAX_ENTRIES = int(os.environ.get("RECORD_CACHE_SIZE", 10000))
+# Records are re-read after this long, which bounds staleness from writes of other processes
+TTL_SECONDS = float(os.environ.get("RECORD_CACHE_TTL_SECONDS", 7200))
+
+class RecordCache:
+    """
+    Bounded read-through cache for records keyed by (kind, id), with TTL and LRU eviction.
+
+    Writes of the data layer keep entries current with update() or drop them with
+    invalidate(). Records are copied in and out, so callers can't change cached state.
+    """
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # (kind, key) -> (expires_at, record)
+        self._entries = OrderedDict()
+        self._counts = Counter()
+
+    def _lookup(self, kind, key, now):
+        entry = self._entries.get((kind, key))
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[(kind, key)]
+            self._counts[kind, 'expired'] += 1
+            return None
+        self._entries.move_to_end((kind, key))
+        return entry
+
+    def _store(self, kind, key, record, now):
+        self._entries[(kind, key)] = (now + self.ttl_seconds, copy.deepcopy(record))
+        self._entries.move_to_end((kind, key))
+        while len(self._entries) > self.max_entries:
+            (evicted_kind, _), _ = self._entries.popitem(last=False)
+            self._counts[evicted_kind, 'evicted'] += 1
+
+    def get(self, kind, key, load):
+        """The cached record, or load() on a miss (None results are not cached)"""
+        if self.ttl_seconds <= 0:
+            return load()
+        with self._lock:
+            entry = self._lookup(kind, key, time.monotonic())
+            self._counts[kind, 'hits' if entry else 'misses'] += 1
+            if entry:
+                return copy.deepcopy(entry[1])
+
+        record = load()
+        if record is not None:
+            self.put(kind, key, record)
+        return record
+
+    def put(self, kind, key, record):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._store(kind, key, record, time.monotonic())
+
+    def update(self, kind, key, change):
+        """Apply a write to a cached record in place: a dict of fields or a function(record)"""
+        with self._lock:
+            entry = self._lookup(kind, key, time.monotonic())
+            if entry is None:
+                return
+            if isinstance(change, dict):
+                entry[1].update(copy.deepcopy(change))
+            else:
+                change(entry[1])
+
+    def invalidate(self, kind, key):
+        with self._lock:
+            self._entries.pop((kind, key), None)
+
+    def metrics(self):
+        """Hits, misses, hit rate, expirations and evictions per kind, and the number of entries"""
+        with self._lock:
+            kinds = sorted({kind for kind, _ in self._counts})
+            stats = {'entries': len(self._entries), 'max_entries': self.max_entries, 'ttl_seconds': self.ttl_seconds}
+            for kind in kinds:
+                hits, misses = self._counts[kind, 'hits'], self._counts[kind, 'misses']
+                stats[kind] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                    'expired': self._counts[kind, 'expired'],
+                    'evicted': self._counts[kind, 'evicted'],
+                }
+            return stats
+
+# Process-wide cache of session, trial and trial sequence records
+record_cache = RecordCache(MAX_ENTRIES, TTL_SECONDS)
@@ -5,7 +5,14 @@ import random
 from dateutil.parser import isoparse
 from datetime import datetime, timedelta, timezone
 from collections import defaultdict             
-from modules.database import supabase, update_session_progress
+from modules.database import (supabase, update_session_progress, mark_progress_persisted, uses_packed_storage,
+                              load_session_record, create_session_record, load_trial_sequence,
+                              remember_trial_sequences, resend_unsaved_allocations)
+from modules.packed_responses import as_trial_rows
+from modules.trial_plan import build_trial_plan
+from modules.state_store import uses_local_store, load_snapshot, restore_state
+from modules.admission import admission
+from modules.subpages.waiting import show_waiting_room
 
 # Cached database fetches with session-specific isolation
 @st.cache_data(ttl=3600, show_spinner=False)
@@ -33,16 +40,24 @@ def init_session():
     if 'session_initialized' in st.session_state:
         return
 
-    # Session ID handling with single rerun
+    # Session ID handling, the new id is written to the URL without a rerun
     session_id = st.query_params.get("session_id")
     if not session_id:
         session_id = str(uuid.uuid4())
         st.query_params["session_id"] = session_id
-        st.rerun()
 
-    # Load or create session with atomic operations
-    if not _load_existing_session(session_id):
-        _create_new_session(session_id)
+    # Load or create session with atomic operations.
+    # A participant in the waiting room is known to be new, skip the lookup on each poll.
+    if st.session_state.get('waiting_for_admission') or not _load_existing_session(session_id):
+        if not admission.try_admit(session_id):
+            st.session_state.waiting_for_admission = True
+            show_waiting_room(session_id)
+            st.stop()
+        try:
+            _create_new_session(session_id)
+        finally:
+            admission.release()
+        st.session_state.waiting_for_admission = False
 
     # Ensure valid state for current trial
     current_trial = st.session_state.get('trial', 1)
@@ -57,24 +72,46 @@ def init_session():
     update_session_progress(session_id)
 
 def _load_existing_session(session_id):
-    """Efficiently load session data with joined queries"""
-    response = supabase.table('sessions') \
-        .select('*, trials(*, allocations(*)), trial_sequence_id') \
-        .eq('session_id', session_id) \
-        .execute()
-
-    if not response.data:
+    """Efficiently load session data with joined queries, through the process-wide record cache"""
+    session_data = load_session_record(session_id)
+    if session_data is None:
         return False
 
-    session_data = response.data[0]
-    trials = session_data.get('trials', [])
+    if uses_packed_storage():
+        # one-to-one embed, expand the packed arrays into the normalized layout
+        packed = session_data.get('session_responses')
+        if isinstance(packed, list):
+            packed = packed[0] if packed else None
+        trials = as_trial_rows(packed)
+    else:
+        trials = session_data.get('trials', [])
 
     # Re-load the stored trial_sequence
-    seq_rec = supabase.table('trial_sequences') \
-        .select('*') \
-        .eq('trial_sequence_id', session_data['trial_sequence_id']) \
-        .execute().data[0]
+    seq_rec = load_trial_sequence(session_data['trial_sequence_id'])
+
+    # State that is not stored in the response tables (e.g. demo data) comes from the
+    # shared snapshot, so any worker process can pick up the session
+    snapshot = load_snapshot(session_id) if uses_local_store() else session_data.get('state_snapshot')
+
+    st.session_state.update(_parse_session_state(
+        session_data,
+        trials,
+        seq_rec,
+        _fetch_fund_returns(session_data['scenario_id']),
+        _fetch_ai_recommendations(session_data['scenario_id']),
+        snapshot
+    ))
+    mark_progress_persisted((
+        session_data['current_page'],
+        session_data['current_trial'],
+        session_data['current_trial_step']
+    ))
+    # writes that had not succeeded when the snapshot was taken, e.g. on another worker
+    resend_unsaved_allocations(session_id)
+    return True
 
+def _parse_session_state(session_data, trials, seq_rec, fund_returns_data, ai_recommendations_data, snapshot=None):
+    """Turn the stored session rows into the participant's session state"""
     # convert string IDs to ints
     fy_trials = [int(x) for x in seq_rec['five_year_trials']]
     tm_trials = [int(x) for x in seq_rec['three_month_trials']]
@@ -85,6 +122,10 @@ def _load_existing_session(session_id):
     else:
         trial_seq = tm_trials
 
+    trial_plan = build_trial_plan(trial_seq, fund_returns_data, ai_recommendations_data)
+    # trials are stored under their actual trial number, state is keyed by ordinal
+    ordinal_by_trial = {entry['actual_trial']: entry['ordinal'] for entry in trial_plan}
+
     # Process allocations in single pass
     allocations = {}
     fund_returns = {}
@@ -102,9 +143,9 @@ def _load_existing_session(session_id):
                     alloc.get('fund_a', 0),
                     alloc.get('fund_b', 0)
                 )
-        allocations[trial_num] = allocs
+        allocations[ordinal_by_trial.get(trial_num, trial_num)] = allocs
 
-    st.session_state.update({
+    state = {
         'page':               session_data['current_page'],
         'trial':              session_data['current_trial'],
         'trial_step':         session_data['current_trial_step'],
@@ -113,14 +154,44 @@ def _load_existing_session(session_id):
         'trial_sequence_id':  session_data['trial_sequence_id'],
         'trial_sequence':     trial_seq,
         'fund_returns':       fund_returns,
-        'allocations':        allocations
-    })
-    return True
+        'allocations':        allocations,
+        'fund_returns_data':  fund_returns_data,
+        'ai_recommendations_data': ai_recommendations_data,
+        'trial_plan':         trial_plan
+    }
+
+    if snapshot:
+        restored = restore_state(snapshot)
+        # responses in the tables are authoritative, the snapshot only fills gaps
+        for ordinal, allocs in restored.pop('allocations', {}).items():
+            stored = allocations.setdefault(ordinal, allocs)
+            for alloc_type, alloc in allocs.items():
+                if stored.get(alloc_type) is None:
+                    stored[alloc_type] = alloc
+        state.update(restored)
+
+    # Step-only progress updates are debounced, the stored step may lag behind the responses
+    if state['page'] == 'trial' and 1 <= state['trial'] <= len(trial_plan):
+        state['trial_step'] = _resume_step(
+            state['trial_step'],
+            allocations.get(state['trial'], {}),
+            trial_plan[state['trial'] - 1]
+        )
+    return state
+
+def _resume_step(trial_step, allocs, entry):
+    """Earliest step consistent with the responses already stored for the trial"""
+    if allocs.get('final'):
+        return 3
+    if allocs.get('initial') and trial_step == 1:
+        return 4 if entry['is_instructed'] else 2
+    return trial_step
 
 def _create_new_session(session_id):
     """Create a new session with optimized data fetching"""
 
     all_seqs     = supabase.table('trial_sequences').select('*').execute().data
+    remember_trial_sequences(all_seqs)
     scenarios    = _fetch_scenario_config()
     all_sessions = supabase.table('sessions').select('*').execute().data
 
@@ -136,6 +207,9 @@ def _create_new_session(session_id):
     else:
         trial_seq = tm_trials
 
+    fund_returns_data       = _fetch_fund_returns(scenario['scenario_id'])
+    ai_recommendations_data = _fetch_ai_recommendations(scenario['scenario_id'])
+
     st.session_state.update({
         'page':                   'consent',
         'trial':                  1,
@@ -146,20 +220,30 @@ def _create_new_session(session_id):
         'max_trials':             len(trial_seq),
         'fund_returns':           {},
         'allocations':            {1: {'initial': None, 'ai': None, 'final': None}},
-        'fund_returns_data':      _fetch_fund_returns(scenario['scenario_id']),
-        'ai_recommendations_data':_fetch_ai_recommendations(scenario['scenario_id'])
+        'fund_returns_data':      fund_returns_data,
+        'ai_recommendations_data':ai_recommendations_data,
+        'trial_plan':             build_trial_plan(trial_seq, fund_returns_data, ai_recommendations_data)
     })
 
-    supabase.table('sessions').insert({
+    create_session_record({
         'session_id':         session_id,
         'scenario_id':        scenario['scenario_id'],
         'trial_sequence_id':  seq_rec['trial_sequence_id'],   # store pointer
         'current_page':       'consent',
-        'current_trial':      0,
+        'current_trial':      1,
         'current_trial_step': 1,
         'created_at':         datetime.now(timezone.utc).isoformat(),
         'max_trials':         len(trial_seq)
-    }).execute()
+    })
+    mark_progress_persisted(('consent', 1, 1))
+
+def occupies_assignment(sess, lock_threshold):
+    """A session counts for its (sequence, scenario) cell if completed with good data or still within the lock window"""
+    created = isoparse(sess['created_at'])
+    completed = sess['completed_at']
+    dq_good = sess.get('data_quality') is True
+
+    return (completed is not None and dq_good) or (created >= lock_threshold)
 
 def get_session_config(all_seqs, scenarios, all_sessions, lock_window_hours=1):
     """Select a scenario and sequence based on existing sessions and lock window"""
@@ -168,14 +252,7 @@ def get_session_config(all_seqs, scenarios, all_sessions, lock_window_hours=1):
     lock_threshold = now - timedelta(hours=lock_window_hours)
 
     # 1. Filter valid sessions
-    valid = []
-    for sess in all_sessions:
-        created = isoparse(sess['created_at'])
-        completed = sess['completed_at']
-        dq_good = sess.get('data_quality') is True
-
-        if (completed is not None and dq_good) or (created >= lock_threshold):
-            valid.append(sess)
+    valid = [sess for sess in all_sessions if occupies_assignment(sess, lock_threshold)]
 
     # 2. Group by sequence
     by_seq = defaultdict(list)
@@ -0,0 +1,66 @@
+"""
+Monte Carlo outcomes of the 50-year final allocation.
+
+Paths are built by drawing the periods of a 50-year horizon (10 five-year or 200
+three-month periods) with replacement from a scenario's fund return series, with
+the return of Fund A and Fund B of a period drawn together. Because a path's log
+growth only depends on how often it drew each period, all paths for all
+allocations 0..100 % are one matrix product:
+
+    log_growth[path, allocation] = counts[path, period] @ log1p(portfolio_return[period, allocation])
+"""
+import numpy as np
+
+HORIZON_YEARS = 50
+DEFAULT_PATHS = 100_000
+PATH_CHUNK = 10_000
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# Allocations to Fund A that outcomes are precomputed for, in %
+ALLOCATIONS = np.arange(0, 101)
+
+def periods_per_horizon(max_trials):
+    """Number of study periods (3 months or 5 years) in the 50-year horizon."""
+    return HORIZON_YEARS * 4 if max_trials == 100 else HORIZON_YEARS // 5
+
+def simulate_outcome_table(fund_returns, periods, paths=DEFAULT_PATHS, seed=0):
+    """
+    Outcome table for all allocations from a {trial_number: (return_a, return_b)} series.
+
+    Returns a dict of arrays indexed by the allocation to Fund A (0..100):
+    'mean' and 'quantiles' (one column per QUANTILES) of the terminal value of
+    1 invested, 'prob_loss' (share of paths ending below 1) and 'annualized_median'.
+    """
+    series = np.array(list(fund_returns.values()), dtype=float).reshape(-1, 2)
+    weights = ALLOCATIONS / 100
+    # (period, allocation); a total loss stays a total loss
+    period_returns = np.outer(series[:, 0], weights) + np.outer(series[:, 1], 1 - weights)
+    with np.errstate(divide='ignore'):
+        log_growth = np.log1p(np.maximum(period_returns, -1.0))
+
+    # (path, allocation), filled in chunks of paths to bound the memory of the draws
+    rng = np.random.default_rng(seed)
+    log_growth = log_growth.astype(np.float32)
+    terminal = np.empty((paths, len(ALLOCATIONS)), dtype=np.float32)
+    for start in range(0, paths, PATH_CHUNK):
+        size = min(PATH_CHUNK, paths - start)
+        counts = rng.multinomial(periods, np.full(len(series), 1 / len(series)), size=size)
+        terminal[start:start + size] = np.exp(counts.astype(np.float32) @ log_growth)
+
+    quantiles = np.quantile(terminal, QUANTILES, axis=0).T
+    return {
+        'mean': terminal.mean(axis=0, dtype=np.float64),
+        'quantiles': quantiles,
+        'prob_loss': (terminal < 1).mean(axis=0),
+        'annualized_median': quantiles[:, QUANTILES.index(0.5)] ** (1 / HORIZON_YEARS) - 1,
+    }
+
+def outcome_for(table, fund_a):
+    """Expected and downside outcome of an allocation to Fund A (0..100 %), a table lookup."""
+    index = int(round(fund_a))
+    return {
+        'expected_value': float(table['mean'][index]),
+        'median_value': float(table['quantiles'][index, QUANTILES.index(0.5)]),
+        'downside_value': float(table['quantiles'][index, QUANTILES.index(0.05)]),
+        'prob_loss': float(table['prob_loss'][index]),
+        'annualized_median': float(table['annualized_median'][index]),
+    }
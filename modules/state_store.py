@@ -0,0 +1,78 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# Participant state that cannot be re-derived from the scenario tables
+SNAPSHOT_KEYS = (
+    'page', 'trial', 'trial_step', 'scenario_id', 'trial_sequence_id',
+    'max_trials', 'allocations', 'demo_data', 'unsaved_allocations'
+)
+
+_local = threading.local()
+
+def _store_path():
+    # Optional local stand-in for the shared state store (e.g. several workers on one machine).
+    # If unset, the snapshot is stored in the 'state_snapshot' column of the sessions table.
+    # Read lazily so a .env file loaded by the database module is respected.
+    return os.environ.get("STATE_STORE_PATH")
+
+def uses_local_store():
+    return bool(_store_path())
+
+def _to_builtin(value):
+    # numpy scalars (e.g. the random demo data) are not JSON serializable
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__} in session snapshot")
+
+def snapshot_state(state):
+    """Return a JSON-safe snapshot of the participant state."""
+    snapshot = {key: state[key] for key in SNAPSHOT_KEYS if key in state}
+    return json.loads(json.dumps(snapshot, default=_to_builtin))
+
+def restore_state(snapshot):
+    """Inverse of snapshot_state: restore ordinal keys and allocation tuples."""
+    state = dict(snapshot)
+    if 'allocations' in state:
+        state['allocations'] = {
+            int(ordinal): {
+                alloc_type: tuple(alloc) if alloc is not None else None
+                for alloc_type, alloc in allocs.items()
+            }
+            for ordinal, allocs in state['allocations'].items()
+        }
+    return state
+
+def _connection():
+    # one connection per thread, Streamlit serves each script run from its own thread
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(_store_path(), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_state (
+                session_id TEXT PRIMARY KEY,
+                state      TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        _local.conn = conn
+    return conn
+
+def save_snapshot(session_id, snapshot):
+    """Write the snapshot to the local shared store."""
+    conn = _connection()
+    with conn:
+        conn.execute("""
+            INSERT INTO session_state (session_id, state, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+        """, (session_id, json.dumps(snapshot), datetime.now(timezone.utc).isoformat()))
+
+def load_snapshot(session_id):
+    """Read the snapshot from the local shared store, None if the session is unknown."""
+    row = _connection().execute(
+        "SELECT state FROM session_state WHERE session_id = ?", (session_id,)
+    ).fetchone()
+    return json.loads(row[0]) if row else None
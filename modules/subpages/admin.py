@@ -0,0 +1,99 @@
+import os
+from urllib.parse import urlencode
+import pandas as pd
+import streamlit as st
+from modules.database import supabase, fetch_all
+from modules.session import _fetch_scenario_config
+from modules.monitoring import StudyMonitor, REFRESH_TTL_SECONDS
+from modules.admission import admission
+from modules.record_cache import record_cache
+from modules.export import FORMATS
+from modules.export_server import EXPORT_PATH, is_admin_token
+
+def is_admin_request():
+    """Admin pages are opened with ?admin=<ADMIN_TOKEN>, disabled if no token is configured"""
+    return is_admin_token(st.query_params.get("admin"))
+
+@st.cache_resource(show_spinner=False)
+def _study_monitor():
+    # one monitor per process, shared by all dashboard viewers
+    return StudyMonitor(supabase)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _fetch_trial_sequence_ids():
+    return [seq['trial_sequence_id'] for seq in
+            fetch_all(lambda: supabase.table('trial_sequences').select('trial_sequence_id').order('trial_sequence_id'))]
+
+def show_admin():
+    st.title("Study Monitoring")
+
+    @st.fragment(run_every=REFRESH_TTL_SECONDS)
+    def live_dashboard():
+        monitor = _study_monitor()
+        monitor.refresh()
+        scenarios = _fetch_scenario_config()
+        stats = monitor.aggregates(scenarios, _fetch_trial_sequence_ids())
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Sessions", stats['sessions'])
+        col2.metric("Completed", f"{stats['completion_rate']:.0%}")
+        col3.metric("Data quality (completed)", f"{stats['data_quality_rate']:.0%}")
+        col4.metric("Instructed response passed", f"{stats['instructed_pass_rate']:.0%}")
+
+        st.subheader("Sessions per page")
+        st.bar_chart(pd.Series(stats['pages'], name="sessions"))
+
+        st.subheader("Sessions per trial")
+        for max_trials in (5, 100):
+            per_trial = {trial: n for (length, trial), n in stats['trials'].items() if length == max_trials}
+            if per_trial:
+                st.caption(f"{max_trials}-trial scenarios")
+                st.bar_chart(pd.Series(per_trial, name="sessions").sort_index())
+
+        st.subheader("Assignment grid (trial sequence × scenario)")
+        grid = pd.DataFrame.from_dict(stats['grid'], orient='index')
+        st.dataframe(grid, use_container_width=True)
+        st.caption(f"Filled cells: {int((grid > 0).to_numpy().sum())} / {grid.size}")
+
+        st.subheader("Admission control")
+        st.json(admission.metrics())
+
+        st.subheader("Record cache")
+        st.json(record_cache.metrics())
+
+        st.caption(f"Rows fetched in last poll: {stats['last_poll_rows']} · refresh every {REFRESH_TTL_SECONDS}s")
+
+    live_dashboard()
+    show_export()
+
+def show_export():
+    st.subheader("Data export")
+    # Base URL of the export server (modules/export_server.py) as seen by the admin's browser
+    export_url = os.environ.get("EXPORT_URL")
+    if not export_url:
+        st.info("Set EXPORT_URL to the address of the export server "
+                "(python -m modules.export_server) to enable downloads.")
+        return
+
+    scenarios = {s['scenario_id']: s['scenario_name'] for s in _fetch_scenario_config()}
+    col1, col2, col3 = st.columns(3)
+    scenario_id = col1.selectbox("Scenario", [None, *scenarios], format_func=lambda s: scenarios.get(s, "All"))
+    completed = col2.selectbox("Sessions", [None, 'yes', 'no'],
+                               format_func=lambda c: {None: "All", 'yes': "Completed", 'no': "Not completed"}[c])
+    export_format = col3.selectbox("Format", list(FORMATS), format_func=lambda f: {'csv': "CSV", 'arrow': "Arrow IPC"}[f])
+    col1, col2 = st.columns(2)
+    created = col1.date_input("Created between", value=())
+    data_quality = col2.checkbox("Only sessions with data quality confirmed")
+
+    params = {
+        'admin': st.query_params['admin'],
+        'format': export_format,
+        'scenario_id': scenario_id,
+        'completed': completed,
+        'data_quality': 'true' if data_quality else None,
+        'from': created[0].isoformat() if len(created) > 0 else None,
+        'to': created[-1].isoformat() if len(created) > 0 else None,
+    }
+    st.link_button("Download", f"{export_url.rstrip('/')}/{EXPORT_PATH}?{urlencode({k: v for k, v in params.items() if v is not None})}")
+    st.caption("One row per allocation with the session, trial and demographic columns; "
+               "the file is streamed in chunks of sessions.")
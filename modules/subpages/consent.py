@@ -1,6 +1,6 @@
 import streamlit as st
-import os
-from modules.database import supabase
+from modules.database import update_session_progress
+from modules.assets import load_text
 
 def show_consent():
     st.title("Welcome!")
@@ -8,14 +8,12 @@ def show_consent():
     # Container with introduction & consent text
     with st.container():
         # Load and display introduction text
-        intro_file_path = os.path.join("assets", "text", "introduction.txt")
-        intro_text = load_text(intro_file_path)
+        intro_text = load_text("introduction.txt")
         st.markdown(intro_text)
         st.markdown("---")
 
         # Load and display consent text
-        consent_file_path = os.path.join("assets", "text", "consent.txt")
-        consent_text = load_text(consent_file_path)
+        consent_text = load_text("consent.txt")
         
         # Consent form
         with st.form(key="consent_form"):
@@ -23,8 +21,7 @@ def show_consent():
 
             # Display the clickable text that expands to show more information
             with st.expander("Obtain more information about the processing of your personal data"):
-                data_processing_file_path = os.path.join("assets", "text", "data_processing.txt")
-                data_processing_text = load_text(data_processing_file_path)
+                data_processing_text = load_text("data_processing.txt")
                 st.markdown(data_processing_text)
 
             consent_given = st.checkbox(
@@ -34,16 +31,7 @@ def show_consent():
             if submitted:
                 if consent_given:
                     # Update sessions table
-                    supabase.table('sessions').update({
-                        'consent_given': True,
-                        'current_page': 'intro'
-                    }).eq('session_id', st.query_params['session_id']).execute()
-
                     st.session_state.page = 'intro'
-                    st.rerun()
+                    update_session_progress(st.query_params['session_id'], consent_given=True)
                 else:
                     st.error("You must agree to participate to continue.")
-
-def load_text(file_path):
-    with open(file_path, "r", encoding="utf-8") as file:
-        return file.read()
\ No newline at end of file
@@ -1,7 +1,7 @@
 import streamlit as st
 import pycountry
 from datetime import datetime, timezone
-from modules.database import supabase, save_demographics
+from modules.database import update_session_progress, save_demographics
 
 def show_debrief():
 
@@ -97,11 +97,12 @@ def show_debrief():
                 })
 
                 # Mark session as complete
-                supabase.table('sessions').update({
-                    'completed_at': datetime.now(timezone.utc).isoformat(),
-                    'data_quality': (use_data == "Yes"),
-                    'data_quality_comment': comment if use_data == "No" else None
-                }).eq('session_id', st.query_params['session_id']).execute()
+                update_session_progress(
+                    st.query_params['session_id'],
+                    completed_at=datetime.now(timezone.utc).isoformat(),
+                    data_quality=(use_data == "Yes"),
+                    data_quality_comment=comment if use_data == "No" else None
+                )
 
                 st.success("Thank you for your participation! Your data has been saved.")
                 st.balloons()
@@ -1,9 +1,9 @@
 import streamlit as st
-import pandas as pd
-import os
 from modules.subpages.intro import scroll_to_top
 from modules.database import supabase, update_session_progress
 from modules.components.charts import create_performance_bar_chart
+from modules.trial_plan import chart_y_range
+from modules.assets import show_image
 
 def handle_demo_steps():
     if st.session_state.trial_step == 1:
@@ -35,7 +35,7 @@ def show_demo_initial():
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("## Fund A 🔵")
-        st.image(os.path.join("assets", "images", "fund_A.png"), width=200)
+        show_image("fund_A.png", width=200)
         initial_a = st.number_input(
             "Allocation to Fund A (%)",
             min_value=0,
@@ -45,7 +45,7 @@ def show_demo_initial():
         )
     with col2:
         st.markdown("## Fund B 🟡")
-        st.image(os.path.join("assets", "images", "fund_B.png"), width=200)
+        show_image("fund_B.png", width=200)
         initial_b = st.number_input(
             "Automatic allocation to Fund B (%)",
             min_value=0,
@@ -56,7 +56,7 @@ def show_demo_initial():
         )
         # st.write(f"Automatic allocation: {initial_b}%")
 
-    if st.button("Submit Allocation"):
+    if st.button("Submit Allocation", key="demo_initial_btn"):
         if initial_a is None:
             st.error("Please specify a percentage for Fund A (0% – 100%).")
         elif initial_b is None:
@@ -67,7 +67,6 @@ def show_demo_initial():
 
             st.session_state.trial_step = 2
             update_session_progress(st.query_params['session_id'])
-            st.rerun()
 
 def show_demo_ai():
     scroll_to_top()
@@ -112,7 +111,7 @@ def show_demo_ai():
         final_b = st.number_input("Automatic allocation to Fund B (%)", min_value=0, max_value=100, value= (100 - final_a) if final_a is not None else 0, key="adjusted_b", disabled=True)
         # st.write(f"Automatic allocation: {adjusted_b}%")
 
-    if st.button("Submit Allocation"):
+    if st.button("Submit Allocation", key="demo_final_btn"):
         if final_a is None:
             st.error("Allocation to Fund A is required.")
         elif final_b is None:
@@ -123,7 +122,6 @@ def show_demo_ai():
 
             st.session_state.trial_step = 3
             update_session_progress(st.query_params['session_id'])
-            st.rerun()
     
 def show_demo_performance():
     scroll_to_top()
@@ -156,10 +154,7 @@ def show_demo_performance():
                 (ai_b/100) * return_b
     user_return = (final_a/100) * return_a +  (final_b/100) * return_b  
 
-    df = pd.DataFrame({
-        'Category': ['Your Portfolio 👤', 'AI Portfolio ✨', 'Fund A 🔵', 'Fund B 🟡'],
-        'Performance': [user_return*100, ai_return*100, return_a*100, return_b*100 ]
-    })
+    performance = (user_return*100, ai_return*100, return_a*100, return_b*100)
 
     if st.session_state.max_trials == 100:
         duration = "last 3 months"
@@ -173,13 +168,12 @@ def show_demo_performance():
 
     st.markdown(f"Overview how your portfolio, the AI portfolio, Fund A and Fund B performed during the **{duration}**:")
     
-    fig = create_performance_bar_chart(df, margin=dict(t=20, b=20))
+    fig = create_performance_bar_chart(performance, chart_y_range(st.session_state.max_trials), margin=dict(t=20, b=20))
     st.plotly_chart(fig, use_container_width=True)
 
     st.markdown(":red[This is the end of the demo. Remember: Fund A and B are made up of real‑world investments. Observe how they perform over time to make informed decisions.]")
 
-    if st.button("Start Experiment"):
+    if st.button("Start Experiment", key="demo_end_btn"):
         st.session_state.page = 'trial'
         st.session_state.trial_step = 1
         update_session_progress(st.query_params['session_id'])
-        st.rerun()
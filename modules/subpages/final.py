@@ -1,6 +1,19 @@
 import streamlit as st
-import os
-from modules.database import supabase, update_session_progress, save_allocation, save_demographics
+import zlib
+from modules.database import update_session_progress, save_allocation, save_trial_returns
+from modules.session import _fetch_fund_returns
+from modules.simulation import simulate_outcome_table, periods_per_horizon, outcome_for
+from modules.assets import show_image
+
+@st.cache_resource(show_spinner=False)
+def outcome_table(scenario_id, max_trials):
+    """Simulated 50-year outcomes of all allocations of a scenario, once per process"""
+    # seeded by the scenario, so every process computes the same table
+    return simulate_outcome_table(
+        _fetch_fund_returns(scenario_id),
+        periods_per_horizon(max_trials),
+        seed=zlib.crc32(scenario_id.encode())
+    )
 
 def show_final():
     st.title("Final Allocation")
@@ -10,11 +23,11 @@ def show_final():
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("## Fund A 🔵")
-        st.image(os.path.join("assets", "images", "fund_A.png"), width=200)
+        show_image("fund_A.png", width=200)
         final_a = st.number_input("Allocation to Fund A (%)", min_value=0, max_value=100, value= None, key="demo_initial_a")
     with col2:
         st.markdown("## Fund B 🟡")
-        st.image(os.path.join("assets", "images", "fund_B.png"), width=200)
+        show_image("fund_B.png", width=200)
         final_b = st.number_input("Automatic allocation to Fund B (%)", min_value=0, max_value=100, value= (100 - final_a) if final_a is not None else 0, key="demo_initial_b", disabled=True)
 
     final_allocation = st.checkbox(
@@ -42,17 +55,17 @@ def show_final():
                 portfolio_return
             )
 
-            trial_response = supabase.table('trials') \
-                .select('trial_id') \
-                .eq('session_id', st.query_params['session_id']) \
-                .eq('trial_number', st.session_state.trial) \
-                .execute()
-            trial_id = trial_response.data[0]['trial_id']
-            supabase.table('trials').update({
-                'return_a': float(return_a),
-                'return_b': float(return_b)
-            }).eq('trial_id', trial_id).execute()
+            save_trial_returns(
+                st.query_params['session_id'],
+                st.session_state.trial,
+                float(return_a),
+                float(return_b)
+            )
+
+            # Expected and downside outcome of the decision over 50 years (table lookup)
+            final_outcome = outcome_for(
+                outcome_table(st.session_state.scenario_id, st.session_state.max_trials), final_a
+            )
 
             st.session_state.page = 'debrief'
-            update_session_progress(st.query_params['session_id'])
-            st.rerun()
\ No newline at end of file
+            update_session_progress(st.query_params['session_id'], final_outcome=final_outcome)
\ No newline at end of file
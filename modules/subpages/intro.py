@@ -1,8 +1,8 @@
 import streamlit as st
 from streamlit.components.v1 import html
-import os
 import numpy as np
-from modules.database import supabase
+from modules.database import update_session_progress
+from modules.assets import load_text
 from streamlit_scroll_to_top import scroll_to_here
 
 def scroll_to_top():
@@ -31,12 +31,9 @@ def show_intro():
     scenario = st.session_state.get('scenario_id')
     # Insert the scenario_id for the scenario "long" from the database
     if st.session_state.max_trials == 100:
-        intro_file_path = os.path.join("assets", "text", "100trial_experiment_description.txt")
+        intro_text = load_text("100trial_experiment_description.txt")
     else:
-        intro_file_path = os.path.join("assets", "text", "5trial_experiment_description.txt")
-
-    with open(intro_file_path, "r", encoding="utf-8") as f:
-        intro_text = f.read()
+        intro_text = load_text("5trial_experiment_description.txt")
     st.write(intro_text)
 
     read_instructions = st.checkbox(
@@ -57,11 +54,5 @@ def show_intro():
             st.session_state.page = 'demo'
             st.session_state.trial_step = 1
 
-            # Immediately update the DB to reflect "demo"
-            supabase.table('sessions').update({
-                'current_page': 'demo',
-                'current_trial': st.session_state.trial,
-                'current_trial_step': st.session_state.trial_step
-            }).eq('session_id', st.query_params['session_id']).execute()
-
-            st.rerun()       
\ No newline at end of file
+            # Immediately update the DB to reflect "demo" (and store the demo data)
+            update_session_progress(st.query_params['session_id'])       
\ No newline at end of file
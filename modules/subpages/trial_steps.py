@@ -1,15 +1,20 @@
 import streamlit as st
 from streamlit.components.v1 import html
-import os
-import pandas as pd
 from modules.subpages.intro import scroll_to_top
-from modules.database import supabase, update_session_progress, save_allocation
+from modules.database import (
+    update_session_progress, save_allocation, save_allocation_in_background,
+    prefetch_trial, flush_session_progress_in_background
+)
 from modules.components.charts import create_performance_bar_chart
+from modules.trial_plan import performance_values
+from modules.prefetch import warm_up
+from modules.subpages.final import outcome_table
+from modules.assets import show_image
 
 # Cache expensive chart creation
 @st.cache_data(max_entries=100)
-def cached_performance_chart(df):
-    return create_performance_bar_chart(df, margin=dict(t=20, b=20))
+def cached_performance_chart(performance, y_range):
+    return create_performance_bar_chart(performance, y_range, margin=dict(t=20, b=20))
 
 
 def handle_trial_steps():
@@ -18,7 +23,7 @@ def handle_trial_steps():
     if st.session_state.trial > st.session_state.max_trials:
         st.session_state.page = 'final'
         update_session_progress(session_id)
-        st.rerun()
+        return
 
     step_handlers = {
         1: show_initial_allocation,
@@ -32,24 +37,22 @@ def show_initial_allocation():
     scroll_to_top()
     session_id     = st.query_params['session_id']
     ordinal        = st.session_state.trial
-    actual_trial   = st.session_state.trial_sequence[ordinal - 1]
+    entry          = st.session_state.trial_plan[ordinal - 1]
+    actual_trial   = entry['actual_trial']
 
-    # Get period information from scenario_config
-    periods = "3 months" if st.session_state.max_trials == 100 else "5 years"
-    
     st.title(f"Step 1: Initial Allocation")
-    st.markdown(f"Please allocate your money for the **next {periods}**.")
+    st.markdown(f"Please allocate your money for the **{entry['next_period']}**.")
     
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("## Fund A 🔵")
-        st.image(os.path.join("assets", "images", "fund_A.png"), width=200)
+        show_image("fund_A.png", width=200)
         initial_a = st.number_input("Allocation to Fund A (%)", 
                                     min_value=0, max_value=100, 
                                     value=None, key=f"initial_a_{ordinal}")
     with col2:
         st.markdown("## Fund B 🟡")
-        st.image(os.path.join("assets", "images", "fund_B.png"), width=200)
+        show_image("fund_B.png", width=200)
         initial_b = 100 - initial_a if initial_a is not None else 0
         st.number_input("Automatic allocation to Fund B (%)", 
                         min_value=0, max_value=100, 
@@ -65,35 +68,27 @@ def show_initial_allocation():
 
         save_allocation(session_id, actual_trial, 'initial', initial_a, initial_b)
         
-        is_instructed = (
-            (st.session_state.max_trials == 5   and ordinal == 3) or
-            (st.session_state.max_trials == 100 and ordinal == 79)
-        )
-        st.session_state.trial_step = 4 if is_instructed else 2
+        st.session_state.trial_step = 4 if entry['is_instructed'] else 2
         st.session_state.allocations[ordinal] = {
             'initial': (initial_a, initial_b),
             'ai':      None,
             'final':   None
         }
         update_session_progress(session_id)
-        st.rerun()
 
 def show_ai_recommendation():
     scroll_to_top()
     session_id   = st.query_params['session_id']
     ordinal      = st.session_state.trial
-    actual_trial = st.session_state.trial_sequence[ordinal - 1]
+    entry        = st.session_state.trial_plan[ordinal - 1]
+    actual_trial = entry['actual_trial']
+    ai_a, ai_b   = entry['ai_a'], entry['ai_b']
 
     st.title(f"Step 2: AI Recommendation")
 
-    try:
-        ai_a, ai_b = st.session_state.ai_recommendations_data[actual_trial]
-    except KeyError:
-        st.error("Missing AI recommendation data!")
-        st.stop()
-
     if not st.session_state.allocations[ordinal]['ai']:
-        save_allocation(session_id, actual_trial, 'ai', ai_a, ai_b)
+        # not needed to render this step, don't wait for the write
+        save_allocation_in_background(session_id, actual_trial, 'ai', ai_a, ai_b)
         st.session_state.allocations[ordinal]['ai'] = (ai_a, ai_b)
 
     initial_a, initial_b = st.session_state.allocations[ordinal]['initial']
@@ -137,7 +132,6 @@ def show_ai_recommendation():
 
         st.session_state.trial_step = 3
         update_session_progress(session_id)
-        st.rerun()
 
 def show_instructed():
     scroll_to_top()
@@ -179,58 +173,55 @@ def show_instructed():
     with col3:
         instructed_a = st.number_input("Final Allocation to Fund A (%)", 
                                min_value=0, max_value=100, 
-                               value=None, key=f"final_a_{current_trial}")
+                               value=None, key=f"instructed_a_{current_trial}")
 
     with col4:
         instructed_b = 100 - instructed_a if instructed_a is not None else 0
         st.number_input("Automatic allocation to Fund B (%)", 
                       min_value=0, max_value=100, 
-                      value=instructed_b, key=f"final_b_{current_trial}", disabled=True)
+                      value=instructed_b, key=f"instructed_b_{current_trial}", disabled=True)
 
     
     # Submit allocation
-    if st.button("Submit Allocation", key=f"final_btn_{current_trial}"):
+    if st.button("Submit Allocation", key=f"instructed_btn_{current_trial}"):
         if instructed_a is None:
             st.error("Allocation to Fund A is required.")
             return
 
-        supabase.table('sessions').update({
-            'instructed_response_2_passed': instructed_a == 55
-        }).eq('session_id', session_id).execute()
-
-        # Move to next step
+        # Move to next step, stored together with the attention check result
         st.session_state.trial_step = 2
-        st.rerun()
+        update_session_progress(session_id, instructed_response_2_passed=instructed_a == 55)
 
 def show_performance():
     scroll_to_top()
     session_id   = st.query_params['session_id']
     ordinal      = st.session_state.trial
-    actual_trial = st.session_state.trial_sequence[ordinal - 1]
+    entry        = st.session_state.trial_plan[ordinal - 1]
 
-    return_a, return_b = st.session_state.fund_returns_data[actual_trial]
-    final_a, final_b   = st.session_state.allocations[ordinal]['final']
-    ai_a, ai_b         = st.session_state.allocations[ordinal]['ai']
-
-    final_return = (final_a/100)*return_a + (final_b/100)*return_b
-    ai_return    = (ai_a/100)*return_a  + (ai_b/100)*return_b
-
-    df = pd.DataFrame({
-        'Category':    ['Your Portfolio 👤', 'AI Portfolio ✨', 'Fund A 🔵', 'Fund B 🟡'],
-        'Performance': [final_return*100, ai_return*100, return_a*100, return_b*100]
-    })
+    final_a, final_b = st.session_state.allocations[ordinal]['final']
+    ai_a, ai_b       = entry['ai_a'], entry['ai_b']
+    performance      = performance_values(entry, final_a, final_b)
 
     st.title("Step 3: Performance")
-    duration = "last 3 months" if st.session_state.max_trials == 100 else "last 5 years"
     st.markdown(f"""
     Allocation breakdown:
     - Your Portfolio: **Fund A**: {final_a}%, **Fund B**: {final_b}%
     - AI portfolio: **Fund A**: {ai_a}%, **Fund B**: {ai_b}%
     
-    Overview how your portfolio, the AI portfolio, Fund A and Fund B performed during the **{duration}**:
+    Overview how your portfolio, the AI portfolio, Fund A and Fund B performed during the **{entry['last_period']}**:
     """)
 
-    st.plotly_chart(cached_performance_chart(df), use_container_width=True)
+    st.plotly_chart(cached_performance_chart(performance, entry['y_range']), use_container_width=True)
+
+    # Use the time the participant reads the chart: create the next trial's row and write
+    # due progress in the background (the next trial's view model is already in the plan)
+    if ordinal < st.session_state.max_trials:
+        prefetch_trial(session_id, st.session_state.trial_plan[ordinal]['actual_trial'])
+    else:
+        # the final allocation is next, simulate its outcomes if this process has not yet
+        # (outside the session's writes, so the final save does not wait for it)
+        warm_up(outcome_table, st.session_state.scenario_id, st.session_state.max_trials)
+    flush_session_progress_in_background(session_id)
 
     btn_label = "Continue to next period" if ordinal < st.session_state.max_trials else ":red[Next: Final Decision]"
     if st.button(btn_label, key=f"continue_{ordinal}"):
@@ -240,4 +231,3 @@ def show_performance():
         else:
             st.session_state.page = 'final'
         update_session_progress(session_id)
-        st.rerun()
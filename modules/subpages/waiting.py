@@ -0,0 +1,16 @@
+import streamlit as st
+from modules.admission import admission, POLL_INTERVAL_SECONDS
+
+def show_waiting_room(session_id):
+    st.title("Welcome!")
+    st.info("Many participants are starting the study right now. You will be forwarded automatically in a few seconds, please do not reload the page.")
+
+    # Only this fragment reruns while waiting, no database access until a slot is free
+    @st.fragment(run_every=POLL_INTERVAL_SECONDS)
+    def poll_admission():
+        position, slot_free = admission.poll(session_id)
+        if slot_free:
+            st.rerun(scope="app")
+        st.caption(f"Participants ahead of you: {position}")
+
+    poll_admission()
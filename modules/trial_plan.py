@@ -0,0 +1,54 @@
+def period_labels(max_trials):
+    """Return the (next, last) period wording for a study length."""
+    if max_trials == 100:
+        return "next 3 months", "last 3 months"
+    return "next 5 years", "last 5 years"
+
+def chart_y_range(max_trials):
+    """Fixed y-axis range of the performance chart for a study length."""
+    # scale so that average return for each fund appears the same size on the subjects screen across conditions
+    return [-35, 35] if max_trials == 100 else [-135, 135]
+
+def is_instructed_trial(max_trials, ordinal):
+    """Whether the ordinal is the instructed-response (attention check) trial."""
+    return (
+        (max_trials == 5   and ordinal == 3) or
+        (max_trials == 100 and ordinal == 79)
+    )
+
+def build_trial_plan(trial_sequence, fund_returns, ai_recommendations):
+    """
+    Materialize the ordered trial plan of a session once.
+
+    Returns a list indexed by ordinal - 1 with the actual trial id, fund returns,
+    AI recommendation, AI portfolio return, period labels and instructed flag,
+    so every trial step is a constant-time lookup.
+    """
+    max_trials = len(trial_sequence)
+    next_period, last_period = period_labels(max_trials)
+    y_range = chart_y_range(max_trials)
+
+    plan = []
+    for ordinal, actual_trial in enumerate(trial_sequence, start=1):
+        return_a, return_b = fund_returns[actual_trial]
+        ai_a, ai_b = ai_recommendations[actual_trial]
+        plan.append({
+            'ordinal':       ordinal,
+            'actual_trial':  actual_trial,
+            'return_a':      return_a,
+            'return_b':      return_b,
+            'ai_a':          ai_a,
+            'ai_b':          ai_b,
+            'ai_return':     (ai_a/100)*return_a + (ai_b/100)*return_b,
+            'next_period':   next_period,
+            'last_period':   last_period,
+            'y_range':       y_range,
+            'is_instructed': is_instructed_trial(max_trials, ordinal)
+        })
+    return plan
+
+def performance_values(entry, final_a, final_b):
+    """Chart values (in %) for a plan entry and the participant's final allocation."""
+    return_a, return_b = entry['return_a'], entry['return_b']
+    final_return = (final_a/100)*return_a + (final_b/100)*return_b
+    return (final_return*100, entry['ai_return']*100, return_a*100, return_b*100)
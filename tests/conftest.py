@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The app modules connect on import: run them against the in-memory stand-in
+os.environ["SUPABASE_URL"] = "local"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,46 @@
+import numpy as np
+from modules.local_backend import LocalSupabase
+from tools.backfill_portfolio_returns import _normalized_updates, _packed_updates
+
+SESSION_ID = "00000000-0000-0000-0000-0000000000aa"
+RETURNS = (np.array([np.nan, 0.10, 0.20]), np.array([np.nan, 0.02, 0.04]))
+
+def test_normalized_backfill_keeps_allocations_resubmitted_meanwhile():
+    client = LocalSupabase()
+    client.table('trials').insert({'trial_id': 't1', 'session_id': SESSION_ID, 'trial_number': 1}).execute()
+    client.table('allocations').insert([
+        {'allocation_id': alloc_id, 'trial_id': 't1', 'allocation_type': alloc_type,
+         'fund_a': 40, 'fund_b': 60, 'portfolio_return': None}
+        for alloc_id, alloc_type in (('a1', 'initial'), ('a2', 'final'))
+    ]).execute()
+
+    updates = _normalized_updates(client, [SESSION_ID], *RETURNS)
+    # the participant resubmits the final allocation before the backfill writes
+    client.table('allocations').update({'fund_a': 70, 'fund_b': 30}).eq('allocation_id', 'a2').execute()
+    written = client.rpc('backfill_allocation_returns', {'p_updates': updates}).execute().data
+
+    rows = {row['allocation_id']: row for row in client.tables['allocations']}
+    assert written == 1
+    assert rows['a1']['portfolio_return'] == 0.4 * 0.10 + 0.6 * 0.02
+    assert (rows['a2']['fund_a'], rows['a2']['portfolio_return']) == (70, None)
+
+def test_packed_backfill_keeps_responses_written_meanwhile():
+    client = LocalSupabase()
+    for slot, fund_a in ((1, 40), (3, 50), (5, 20)):
+        client.rpc('record_response', {'p_session_id': SESSION_ID, 'p_slot': slot, 'p_fund_a': fund_a,
+                                       'p_fund_b': 100 - fund_a, 'p_portfolio_return': None}).execute()
+
+    updates = _packed_updates(client, [SESSION_ID], *RETURNS)
+    # a resubmit of slot 3 and a new response in slot 7 land before the backfill writes
+    for slot, fund_a in ((3, 90), (7, 10)):
+        client.rpc('record_response', {'p_session_id': SESSION_ID, 'p_slot': slot, 'p_fund_a': fund_a,
+                                       'p_fund_b': 100 - fund_a, 'p_portfolio_return': None}).execute()
+    written = client.rpc('backfill_packed_returns', {'p_updates': updates}).execute().data
+
+    row = client.tables['session_responses'][0]
+    assert written == 2
+    assert row['fund_a'] == [40, None, 90, None, 20, None, 10]
+    assert row['portfolio_return'][0] == 0.4 * 0.10 + 0.6 * 0.02
+    assert row['portfolio_return'][2] is None
+    assert row['portfolio_return'][4] == 0.2 * 0.20 + 0.8 * 0.04
+    assert row['portfolio_return'][6] is None
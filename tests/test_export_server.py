@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import socket
+import subprocess
+import urllib.error
+import urllib.request
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def export_server():
+    port = _free_port()
+    env = {**os.environ, "SUPABASE_URL": "local", "ADMIN_TOKEN": "secret"}
+    proc = subprocess.Popen([sys.executable, "-m", "modules.export_server", "--port", str(port), "--address", "127.0.0.1"],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                assert proc.poll() is None and time.monotonic() < deadline, "export server did not start"
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+def test_first_request_to_a_fresh_server_gets_the_export(export_server):
+    # the route exists from the start, no app page has to run first
+    with urllib.request.urlopen(f"{export_server}/export/responses?admin=secret&format=csv") as response:
+        assert response.status == 200
+        assert response.headers["Content-Type"].startswith("text/csv")
+        assert response.read().startswith(b"session_id,")
+
+def test_export_requires_the_admin_token(export_server):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"{export_server}/export/responses?admin=wrong")
+    assert error.value.code == 403
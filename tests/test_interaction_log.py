@@ -0,0 +1,43 @@
+import uuid
+from streamlit.testing.v1 import AppTest
+from modules import interaction_log
+from modules.database import supabase
+from modules.fault_injection import with_faults
+
+APP = "../app.py"
+FAILING_APPEND = {'rules': [{'table': 'append_interaction_events', 'verb': 'rpc', 'error_rate': 1}]}
+
+def _logged_events(session_id):
+    rows = [row for row in supabase.tables['interaction_logs'] if row['session_id'] == session_id]
+    return rows[0]['events'] if rows else []
+
+def test_failed_append_keeps_events_for_the_next_run(monkeypatch):
+    monkeypatch.setenv("RECORD_INTERACTIONS", "1")
+    monkeypatch.setattr(interaction_log, 'MAX_PENDING_EVENTS', 3)
+    monkeypatch.setattr(interaction_log, 'supabase', with_faults(supabase, FAILING_APPEND))
+
+    session_id = str(uuid.uuid4())
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.query_params['session_id'] = session_id
+    at.run()
+    # consent -> intro flushes the events, the append fails
+    at.checkbox[0].check()
+    at.button[0].click()
+    at.run()
+    assert not at.exception
+    assert not at.error
+    assert at.session_state.page == 'intro'
+    assert len(at.session_state.pending_events) == 2
+    assert at.session_state.events_unsent
+
+    # every run retries, the buffer keeps only the latest events
+    for _ in range(3):
+        at.run()
+    assert not at.exception
+    assert len(at.session_state.pending_events) == 3
+
+    monkeypatch.setattr(interaction_log, 'supabase', supabase)
+    at.run()
+    assert at.session_state.pending_events == []
+    assert not at.session_state.events_unsent
+    assert len(_logged_events(session_id)) == 3
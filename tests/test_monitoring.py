@@ -0,0 +1,23 @@
+from benchmarks import synthetic
+from modules.local_backend import LocalSupabase
+from modules.monitoring import StudyMonitor
+from modules.database import MAX_ROWS_PER_REQUEST
+
+class _CappedSupabase(LocalSupabase):
+    # like PostgREST, a response has at most max-rows rows
+    def _select(self, query):
+        return super()._select(query)[:MAX_ROWS_PER_REQUEST]
+
+def test_refresh_reads_sessions_beyond_one_page_of_rows():
+    client = _CappedSupabase.seeded()
+    data = synthetic.dataset(2500)
+    client.table('sessions').insert(data['sessions']).execute()
+
+    monitor = StudyMonitor(client)
+    monitor.refresh(force=True)
+    stats = monitor.aggregates(data['scenarios'], [s['trial_sequence_id'] for s in data['trial_sequences']])
+
+    assert stats['sessions'] == 2500
+    assert stats['last_poll_rows'] == 2500
+    completed = sum(s['completed_at'] is not None for s in data['sessions'])
+    assert stats['completion_rate'] == completed / 2500
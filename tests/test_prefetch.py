@@ -0,0 +1,74 @@
+import uuid
+from streamlit.testing.v1 import AppTest
+from modules import prefetch, database
+from modules.database import supabase
+from modules.operation_keys import trial_key
+from modules.state_store import save_snapshot, snapshot_state
+
+APP = "../app.py"
+
+def _fail():
+    raise RuntimeError("backend unavailable")
+
+def test_failed_work_of_sessions_that_do_not_come_back_is_dropped(monkeypatch):
+    monkeypatch.setattr(prefetch, 'FAILED_TTL_SECONDS', 0)
+    prefetch.schedule("gone", _fail).exception()
+    assert "gone" in prefetch._failed
+
+    prefetch.schedule("other", lambda: None).result()
+    assert "gone" not in prefetch._failed
+    assert "gone" not in prefetch._pending
+
+def _click(at, label):
+    next(b for b in at.button if label in (b.label or '')).click()
+    return at.run()
+
+def _submit(at, value):
+    at.number_input[0].set_value(value)
+    return _click(at, "Submit")
+
+def test_resume_on_another_worker_resends_a_failed_background_allocation(monkeypatch, tmp_path):
+    monkeypatch.setenv("STATE_STORE_PATH", str(tmp_path / "state.db"))
+    save_allocation = database._save_allocation
+    def save_all_but_ai(session_id, trial_num, allocation_type, *args):
+        if allocation_type == 'ai':
+            _fail()
+        save_allocation(session_id, trial_num, allocation_type, *args)
+    monkeypatch.setattr(database, '_save_allocation', save_all_but_ai)
+
+    session_id = str(uuid.uuid4())
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.query_params['session_id'] = session_id
+    at.run()
+    at.checkbox[0].check()
+    at.button[0].click()
+    at.run()
+    at.checkbox[0].check()
+    at = _click(at, "Start Demo")
+    at = _submit(at, 30)
+    at = _submit(at, 40)
+    at = _click(at, "Start Experiment")
+    at = _submit(at, 50)
+    if at.session_state.trial_step == 4:
+        at = _submit(at, 55)
+    assert at.session_state.trial_step == 2
+    # the background write of the AI recommendation fails
+    assert prefetch._pending[session_id].exception() is not None
+    actual_trial = at.session_state.trial_plan[0]['actual_trial']
+    assert f"{actual_trial}:ai" in at.session_state.unsaved_allocations
+
+    # the snapshot, with the AI allocation, reaches the shared store before the write succeeds,
+    # and the participant's next run is served by a worker without this process' failed work
+    save_snapshot(session_id, snapshot_state(at.session_state))
+    prefetch._failed.pop(session_id)
+    monkeypatch.setattr(database, '_save_allocation', save_allocation)
+
+    resumed = AppTest.from_file(APP, default_timeout=60)
+    resumed.query_params['session_id'] = session_id
+    resumed.run()
+    assert not resumed.exception
+    prefetch.wait_for_background(session_id)
+    trial_id = trial_key(session_id, actual_trial)
+    assert any(row['trial_id'] == trial_id and row['allocation_type'] == 'ai'
+               for row in supabase.tables['allocations'])
+    assert resumed.session_state.unsaved_allocations == {}
@@ -0,0 +1,217 @@
+"""
+Backfill realized portfolio returns of stored allocations.
+
+The app only stores `portfolio_return` for the 'last-50y' allocation. This job
+computes it for every 'initial', 'ai' and 'final' allocation from the fund
+returns of the allocation's trial (`trials.trial_number` is the scenario's trial
+number) and writes the results back in bulk. Scenarios are processed in
+parallel, each one in chunks of sessions; a checkpoint per scenario makes
+interrupted runs resume where they stopped.
+
+The job can run while the study is live: the results are written by the
+backfill_* RPCs (see README), which only set a return that is still NULL and
+whose allocation still has the fund_a/fund_b it was computed from. Responses
+written in the meantime are never overwritten, and an allocation resubmitted
+in the meantime keeps its NULL return for the next run. Run from the
+repository root:
+
+    python -m tools.backfill_portfolio_returns --workers 4
+    python -m tools.backfill_portfolio_returns --dry-run
+"""
+import os
+import json
+import time
+import argparse
+import multiprocessing as mp
+
+import numpy as np
+
+# Allocation types whose portfolio return is backfilled; 'last-50y' is stored by the app
+BACKFILLED_TYPES = ('initial', 'ai', 'final')
+
+def _return_table(supabase, scenario_id):
+    """(return_a, return_b) arrays indexed by trial_number, NaN where a trial has no returns"""
+    from modules.database import fetch_all
+
+    rows = fetch_all(lambda: supabase.table('fund_returns')
+                     .select('trial_number, return_a, return_b')
+                     .eq('scenario_id', scenario_id)
+                     .order('trial_number'))
+    size = max((row['trial_number'] for row in rows), default=0) + 1
+    return_a, return_b = np.full(size, np.nan), np.full(size, np.nan)
+    for row in rows:
+        return_a[row['trial_number']] = row['return_a']
+        return_b[row['trial_number']] = row['return_b']
+    return return_a, return_b
+
+def portfolio_returns(trial_numbers, fund_a, fund_b, return_a, return_b):
+    """Vectorized (fund_a/100)*return_a + (fund_b/100)*return_b per allocation, NaN for unknown trials"""
+    trial_numbers = np.asarray(trial_numbers, dtype=np.int64)
+    known = (trial_numbers >= 0) & (trial_numbers < len(return_a))
+    index = np.where(known, trial_numbers, 0)
+    result = (np.asarray(fund_a, dtype=float) / 100) * return_a[index] \
+        + (np.asarray(fund_b, dtype=float) / 100) * return_b[index]
+    return np.where(known, result, np.nan)
+
+def _normalized_updates(supabase, session_ids, return_a, return_b):
+    """Computed portfolio_return of the allocations of the sessions, with the funds it is based on"""
+    from modules.database import fetch_all
+
+    trials = fetch_all(lambda: supabase.table('trials')
+                       .select('trial_id, trial_number, allocations(*)')
+                       .in_('session_id', session_ids)
+                       .order('trial_id'))
+    pending = [
+        (trial['trial_number'], alloc)
+        for trial in trials
+        for alloc in trial['allocations']
+        if alloc['allocation_type'] in BACKFILLED_TYPES and alloc.get('portfolio_return') is None
+    ]
+    if not pending:
+        return []
+
+    values = portfolio_returns(
+        [trial_number for trial_number, _ in pending],
+        [alloc['fund_a'] for _, alloc in pending],
+        [alloc['fund_b'] for _, alloc in pending],
+        return_a, return_b
+    )
+    return [
+        {
+            'allocation_id': alloc['allocation_id'],
+            'fund_a': alloc['fund_a'],
+            'fund_b': alloc['fund_b'],
+            'portfolio_return': float(value)
+        }
+        for (_, alloc), value in zip(pending, values) if not np.isnan(value)
+    ]
+
+def _packed_updates(supabase, session_ids, return_a, return_b):
+    """Computed portfolio_return per (session, array slot), with the funds it is based on"""
+    from modules.packed_responses import ALLOCATION_TYPES
+
+    records = supabase.table('session_responses') \
+        .select('session_id, fund_a, fund_b, portfolio_return') \
+        .in_('session_id', session_ids) \
+        .execute().data
+    backfilled = np.isin(np.array(ALLOCATION_TYPES), BACKFILLED_TYPES)
+
+    updates = []
+    for record in records:
+        fund_a = np.array(record['fund_a'] or [], dtype=float)  # None -> NaN
+        fund_b = np.array(record['fund_b'] or [], dtype=float)
+        stored = list(record['portfolio_return'] or [])
+        stored.extend([None] * (len(fund_a) - len(stored)))
+
+        slots = np.arange(len(fund_a))
+        trial_numbers = slots // len(ALLOCATION_TYPES) + 1
+        missing = np.array([value is None for value in stored[:len(fund_a)]], dtype=bool)
+        todo = missing & backfilled[slots % len(ALLOCATION_TYPES)] & ~np.isnan(fund_a)
+        if not todo.any():
+            continue
+
+        values = portfolio_returns(trial_numbers[todo], fund_a[todo], fund_b[todo], return_a, return_b)
+        updates.extend(
+            # Postgres arrays start at 1
+            {'session_id': record['session_id'], 'slot': int(index) + 1, 'fund_a': float(fund_a[index]),
+             'fund_b': float(fund_b[index]), 'portfolio_return': float(value)}
+            for index, value in zip(slots[todo], values) if not np.isnan(value)
+        )
+    return updates
+
+def _checkpoint_path(checkpoint_dir, scenario_id):
+    return os.path.join(checkpoint_dir, f"{scenario_id}.json")
+
+def _load_checkpoint(checkpoint_dir, scenario_id):
+    try:
+        with open(_checkpoint_path(checkpoint_dir, scenario_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'last_session_id': None, 'sessions': 0, 'updated': 0}
+
+def _save_checkpoint(checkpoint_dir, scenario_id, checkpoint):
+    path = _checkpoint_path(checkpoint_dir, scenario_id)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+def backfill_scenario(scenario_id, checkpoint_dir, chunk_size, dry_run=False):
+    """
+    Backfill all sessions of one scenario in session_id order, one chunk at a time.
+    The checkpoint is written after each chunk's bulk update, so a restarted run
+    continues with the next chunk (chunks are idempotent: only missing returns are written).
+    """
+    from modules.database import supabase, uses_packed_storage, MAX_ROWS_PER_REQUEST
+
+    packed = uses_packed_storage()
+    return_a, return_b = _return_table(supabase, scenario_id)
+    checkpoint = _load_checkpoint(checkpoint_dir, scenario_id)
+    started = time.perf_counter()
+
+    while True:
+        query = supabase.table('sessions').select('session_id').eq('scenario_id', scenario_id)
+        if checkpoint['last_session_id']:
+            query = query.gt('session_id', checkpoint['last_session_id'])
+        session_ids = sorted(row['session_id'] for row in query.order('session_id').limit(chunk_size).execute().data)
+        if not session_ids:
+            break
+
+        if packed:
+            updates = _packed_updates(supabase, session_ids, return_a, return_b)
+            rpc = 'backfill_packed_returns'
+        else:
+            updates = _normalized_updates(supabase, session_ids, return_a, return_b)
+            rpc = 'backfill_allocation_returns'
+
+        written = len(updates)
+        if updates and not dry_run:
+            written = 0
+            for start in range(0, len(updates), MAX_ROWS_PER_REQUEST):
+                batch = updates[start:start + MAX_ROWS_PER_REQUEST]
+                written += supabase.rpc(rpc, {'p_updates': batch}).execute().data
+
+        checkpoint['last_session_id'] = session_ids[-1]
+        checkpoint['sessions'] += len(session_ids)
+        checkpoint['updated'] += written
+        if not dry_run:
+            _save_checkpoint(checkpoint_dir, scenario_id, checkpoint)
+
+    return scenario_id, checkpoint, time.perf_counter() - started
+
+def _backfill(args):
+    return backfill_scenario(*args)
+
+def run(workers, checkpoint_dir, chunk_size, dry_run=False):
+    from modules.database import supabase
+
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    scenario_ids = [row['scenario_id'] for row in supabase.table('scenario_config').select('scenario_id').execute().data]
+    tasks = [(scenario_id, checkpoint_dir, chunk_size, dry_run) for scenario_id in scenario_ids]
+
+    if workers == 1:
+        results = map(_backfill, tasks)
+    else:
+        # fresh interpreters: each worker opens its own connection instead of inheriting the parent's
+        pool = mp.get_context("spawn").Pool(min(workers, len(tasks)))
+        results = pool.imap_unordered(_backfill, tasks)
+
+    try:
+        for scenario_id, checkpoint, seconds in results:
+            print(f"{scenario_id}: {checkpoint['sessions']} sessions, "
+                  f"{checkpoint['updated']} {'rows to update' if dry_run else 'rows updated'} ({seconds:.1f}s)")
+    finally:
+        if workers != 1:
+            pool.close()
+            pool.join()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="processes, scenarios run in parallel")
+    parser.add_argument('--chunk-size', type=int, default=100, help="sessions per chunk")
+    parser.add_argument('--checkpoint-dir', default=".backfill_checkpoints")
+    parser.add_argument('--dry-run', action='store_true', help="compute and count, write nothing")
+    args = parser.parse_args()
+    run(args.workers, args.checkpoint_dir, args.chunk_size, args.dry_run)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Bootstrap and permutation comparison of the study conditions.
+
+Per session, three metrics are computed from the stored allocations:
+- woa: mean weight of advice, (final - initial) / (ai - initial) over the trials
+  where the AI recommendation differed from the initial allocation
+- fund_a: mean final allocation to Fund A (%)
+- return: mean realized return of the final allocations per period
+
+The command reports bootstrap confidence intervals of the mean of each metric per
+(scenario, trial length) and, per trial length, the balanced - unbalanced difference
+with its bootstrap interval and permutation p-value. Resamples run in a process pool
+on shared-memory arrays; every block of resamples has its own seed derived from
+--seed, so results do not depend on the number of workers. Run from the repository root:
+
+    python -m tools.compare_scenarios --resamples 10000 --workers 8 --out comparison.json
+"""
+import os
+import json
+import time
+import argparse
+import warnings
+import multiprocessing as mp
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+METRICS = ('woa', 'fund_a', 'return')
+# Resamples per task; a block holds (BLOCK_SIZE, sessions of a group, METRICS) draws
+BLOCK_SIZE = 100
+CONFIDENCE = 0.95
+
+# --- data ------------------------------------------------------------------------
+
+def _session_metrics(trials, fund_returns, skip_trial=None):
+    """Metrics of one session from its trials (with nested allocations)"""
+    woa, fund_a, returns = [], [], []
+    for trial in trials:
+        if trial['trial_number'] == skip_trial:
+            continue
+        allocs = {a['allocation_type']: a for a in trial['allocations']}
+        if 'final' not in allocs:
+            continue
+        final_a = allocs['final']['fund_a']
+        fund_a.append(final_a)
+        if trial['trial_number'] in fund_returns:
+            return_a, return_b = fund_returns[trial['trial_number']]
+            returns.append((final_a / 100) * return_a + (allocs['final']['fund_b'] / 100) * return_b)
+        if 'initial' in allocs and 'ai' in allocs and allocs['ai']['fund_a'] != allocs['initial']['fund_a']:
+            woa.append((final_a - allocs['initial']['fund_a']) / (allocs['ai']['fund_a'] - allocs['initial']['fund_a']))
+    mean = lambda values: float(np.mean(values)) if values else np.nan
+    return mean(woa), mean(fund_a), mean(returns)
+
+def load_metrics(supabase):
+    """
+    (metrics array of shape (sessions, METRICS), group index per session, groups)
+    with groups a list of scenario dicts, from the study tables.
+    """
+    from modules.database import fetch_all, uses_packed_storage
+    from modules.packed_responses import as_trial_rows
+    from modules.trial_plan import is_instructed_trial
+
+    scenarios = supabase.table('scenario_config').select('*').execute().data
+    group_of = {s['scenario_id']: i for i, s in enumerate(scenarios)}
+    fund_returns = {}
+    for row in fetch_all(lambda: supabase.table('fund_returns').select('*').order('fund_return_id')):
+        fund_returns.setdefault(row['scenario_id'], {})[row['trial_number']] = (row['return_a'], row['return_b'])
+    sequences = {
+        s['trial_sequence_id']: s for s in
+        fetch_all(lambda: supabase.table('trial_sequences').select('*').order('trial_sequence_id'))
+    }
+
+    responses = 'session_responses(*)' if uses_packed_storage() else 'trials(*, allocations(*))'
+    sessions = fetch_all(lambda: supabase.table('sessions')
+                         .select(f'session_id, scenario_id, trial_sequence_id, max_trials, {responses}')
+                         .order('session_id'))
+
+    rows, groups = [], []
+    for session in sessions:
+        if session['scenario_id'] not in group_of:
+            continue
+        if uses_packed_storage():
+            packed = session.get('session_responses') or []
+            trials = as_trial_rows(packed[0] if isinstance(packed, list) and packed else packed or None)
+        else:
+            trials = session.get('trials') or []
+        if not trials:
+            continue
+
+        # the instructed trial (attention check) is not an advice-taking decision
+        seq = sequences.get(session['trial_sequence_id'])
+        skip_trial = None
+        if seq:
+            trial_seq = seq['five_year_trials'] if session['max_trials'] == 5 else seq['three_month_trials']
+            skip_trial = next((actual for ordinal, actual in enumerate(trial_seq, start=1)
+                               if is_instructed_trial(session['max_trials'], ordinal)), None)
+
+        rows.append(_session_metrics(trials, fund_returns.get(session['scenario_id'], {}), skip_trial))
+        groups.append(group_of[session['scenario_id']])
+
+    return np.array(rows, dtype=float).reshape(-1, len(METRICS)), np.array(groups, dtype=np.int64), scenarios
+
+# --- resampling ------------------------------------------------------------------
+
+_shared = {}
+
+@contextmanager
+def _quiet_nanmean():
+    """Groups where a metric is undefined for every drawn session yield NaN silently"""
+    with warnings.catch_warnings(), np.errstate(invalid='ignore'):
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        yield
+
+def _share(array):
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+def _attach(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+def _init_worker(metrics_spec, groups_spec):
+    # keep the segments referenced for the lifetime of the worker
+    _shared['metrics_shm'], _shared['metrics'] = _attach(metrics_spec)
+    _shared['groups_shm'], _shared['groups'] = _attach(groups_spec)
+
+def _resample_block(args):
+    """
+    One block of resamples: bootstrap means per group, and for each (a, b) pair the
+    bootstrap and permutation differences of means. Shapes (n, groups, metrics),
+    (n, pairs, metrics), (n, pairs, metrics).
+    """
+    seed, n, num_groups, pairs = args
+    metrics, groups = _shared['metrics'], _shared['groups']
+    rng = np.random.default_rng(seed)
+    members = [np.flatnonzero(groups == g) for g in range(num_groups)]
+
+    boot = np.full((n, num_groups, metrics.shape[1]), np.nan)
+    for g, index in enumerate(members):
+        if len(index):
+            draws = index[rng.integers(0, len(index), size=(n, len(index)))]
+            with _quiet_nanmean():
+                boot[:, g] = np.nanmean(metrics[draws], axis=1)
+
+    perm = np.full((n, len(pairs), metrics.shape[1]), np.nan)
+    for p, (a, b) in enumerate(pairs):
+        pooled = np.concatenate([members[a], members[b]])
+        if len(members[a]) == 0 or len(members[b]) == 0:
+            continue
+        shuffled = pooled[rng.permuted(np.tile(np.arange(len(pooled)), (n, 1)), axis=1)]
+        with _quiet_nanmean():
+            perm[:, p] = np.nanmean(metrics[shuffled[:, :len(members[a])]], axis=1) \
+                - np.nanmean(metrics[shuffled[:, len(members[a]):]], axis=1)
+
+    diff = boot[:, [a for a, _ in pairs]] - boot[:, [b for _, b in pairs]]
+    return boot, diff, perm
+
+def comparison_pairs(scenarios):
+    """(balanced, unbalanced) group index pairs with the same trial length"""
+    pairs = []
+    for a, first in enumerate(scenarios):
+        for b, second in enumerate(scenarios):
+            if (first['ai_type'], second['ai_type']) == ('balanced', 'unbalanced') \
+                    and first['num_trials'] == second['num_trials']:
+                pairs.append((a, b))
+    return pairs
+
+def run_analysis(metrics, groups, scenarios, resamples, workers, seed):
+    pairs = comparison_pairs(scenarios)
+    blocks = [min(BLOCK_SIZE, resamples - start) for start in range(0, resamples, BLOCK_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(blocks))
+    tasks = [(block_seed, n, len(scenarios), pairs) for block_seed, n in zip(seeds, blocks)]
+
+    metrics_shm, metrics_spec = _share(metrics)
+    groups_shm, groups_spec = _share(groups)
+    try:
+        with mp.get_context("spawn").Pool(workers, initializer=_init_worker,
+                                          initargs=(metrics_spec, groups_spec)) as pool:
+            # map keeps the block order, so the result is the same for any number of workers
+            results = pool.map(_resample_block, tasks)
+    finally:
+        for shm in (metrics_shm, groups_shm):
+            shm.close()
+            shm.unlink()
+
+    boot = np.concatenate([r[0] for r in results])
+    diff = np.concatenate([r[1] for r in results])
+    perm = np.concatenate([r[2] for r in results])
+    return _summarize(metrics, groups, scenarios, pairs, boot, diff, perm)
+
+def _interval(samples):
+    tail = (1 - CONFIDENCE) / 2 * 100
+    low, high = np.nanpercentile(samples, [tail, 100 - tail], axis=0)
+    return low.tolist(), high.tolist()
+
+def _summarize(metrics, groups, scenarios, pairs, boot, diff, perm):
+    with _quiet_nanmean():
+        observed = [np.nanmean(metrics[groups == g], axis=0) for g in range(len(scenarios))]
+
+    summary = {'resamples': len(boot), 'confidence': CONFIDENCE, 'groups': [], 'comparisons': []}
+    for g, scenario in enumerate(scenarios):
+        low, high = _interval(boot[:, g])
+        summary['groups'].append({
+            'scenario_id': scenario['scenario_id'],
+            'scenario_name': scenario.get('scenario_name'),
+            'num_trials': scenario['num_trials'],
+            'sessions': int((groups == g).sum()),
+            'metrics': {m: {'mean': float(observed[g][i]), 'low': low[i], 'high': high[i]}
+                        for i, m in enumerate(METRICS)}
+        })
+    for p, (a, b) in enumerate(pairs):
+        observed_diff = observed[a] - observed[b]
+        low, high = _interval(diff[:, p])
+        extreme = (np.abs(perm[:, p]) >= np.abs(observed_diff)).sum(axis=0)
+        p_values = (extreme + 1) / (len(perm) + 1)
+        summary['comparisons'].append({
+            'num_trials': scenarios[a]['num_trials'],
+            'balanced': scenarios[a]['scenario_id'],
+            'unbalanced': scenarios[b]['scenario_id'],
+            'metrics': {m: {'difference': float(observed_diff[i]), 'low': low[i], 'high': high[i],
+                            'p_value': float(p_values[i])}
+                        for i, m in enumerate(METRICS)}
+        })
+    return summary
+
+def _print_summary(summary):
+    print(f"{summary['resamples']} resamples, {summary['confidence']:.0%} intervals")
+    print(f"{'scenario':<24} {'trials':>6} {'n':>6}  " + "  ".join(f"{m:>26}" for m in METRICS))
+    for group in summary['groups']:
+        cells = [f"{s['mean']:8.3f} [{s['low']:7.3f}, {s['high']:7.3f}]" for s in group['metrics'].values()]
+        print(f"{str(group['scenario_name'] or group['scenario_id'])[:24]:<24} {group['num_trials']:>6} "
+              f"{group['sessions']:>6}  " + "  ".join(cells))
+    print("\nbalanced - unbalanced")
+    for comparison in summary['comparisons']:
+        cells = [f"{s['difference']:7.3f} [{s['low']:7.3f}, {s['high']:7.3f}] p={s['p_value']:.4f}"
+                 for s in comparison['metrics'].values()]
+        print(f"{comparison['num_trials']:>3} trials  " + "  ".join(cells))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--resamples', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="write the summary as JSON")
+    args = parser.parse_args()
+
+    from modules.database import supabase
+
+    started = time.perf_counter()
+    metrics, groups, scenarios = load_metrics(supabase)
+    summary = run_analysis(metrics, groups, scenarios, args.resamples, args.workers, args.seed)
+    summary['seed'] = args.seed
+    _print_summary(summary)
+    print(f"\n{len(metrics)} sessions in {time.perf_counter() - started:.1f}s")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()